@@ -0,0 +1,24 @@
+import asyncio
+
+from starlette.requests import Request
+
+from app.helpers.exceptions import ClientDisconnected
+
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+async def cancel_on_disconnect(request: Request, awaitable):
+    """Await ``awaitable``, cancelling it as soon as the HTTP client disconnects.
+
+    Cancelling a running asyncpg query also cancels it on the Postgres server.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        task.cancel()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+import orjson
+import redis
+from redis import asyncio as aioredis
+
+from app.helpers.response import json_default
+from app.settings import CHART_CACHE_LOCAL_SIZE, CHART_CACHE_TTL, REDIS_URL
+
+DATA_VERSION_KEY = "chart_cache:{domain}:version"
+CHART_KEY = "chart_cache:{domain}:{version}:{config_hash}"
+
+
+def data_version_key(domain: str) -> str:
+    return DATA_VERSION_KEY.format(domain=domain)
+
+
+def config_hash(chart_config: dict) -> str:
+    serialized_config = json.dumps(chart_config, sort_keys=True, default=str)
+    return hashlib.sha256(serialized_config.encode("utf-8")).hexdigest()
+
+
+def chart_etag(version: int, chart_configs: list[dict], **params) -> str:
+    """Strong ETag for chart data from the tenant data version and chart configs."""
+    serialized = json.dumps(
+        {"version": version, "configs": chart_configs, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return f'"{hashlib.sha256(serialized.encode("utf-8")).hexdigest()}"'
+
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    def get(self, key: str):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value):
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+class ChartCache:
+    """Two level cache for generated chart payloads.
+
+    Keys contain the tenant's data version, which is bumped in Redis when EL or
+    dbt runs finish, so stale entries in both levels are never read again and
+    simply expire.
+    """
+
+    def __init__(self, redis_url: str | None, ttl: int, local_size: int):
+        self.ttl = ttl
+        self.local = LRUCache(local_size, ttl)
+        self.redis = aioredis.from_url(redis_url) if redis_url else None
+
+    async def data_version(self, domain: str) -> int:
+        if self.redis is None:
+            return 0
+        try:
+            version = await self.redis.get(data_version_key(domain))
+        except redis.RedisError:
+            return 0
+        return int(version or 0)
+
+    @staticmethod
+    def make_key(domain: str, version: int, chart_config: dict) -> str:
+        return CHART_KEY.format(
+            domain=domain, version=version, config_hash=config_hash(chart_config)
+        )
+
+    async def get_many(self, keys: list[str]) -> list:
+        values = [self.local.get(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        if not missing or self.redis is None:
+            return values
+
+        try:
+            redis_values = await self.redis.mget([keys[index] for index in missing])
+        except redis.RedisError:
+            return values
+
+        for index, redis_value in zip(missing, redis_values):
+            if redis_value is not None:
+                values[index] = orjson.loads(redis_value)
+                self.local.set(keys[index], values[index])
+        return values
+
+    async def set_many(self, items: dict):
+        for key, value in items.items():
+            self.local.set(key, value)
+        if self.redis is None or not items:
+            return
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipeline:
+                for key, value in items.items():
+                    pipeline.set(
+                        key, orjson.dumps(value, default=json_default), ex=self.ttl
+                    )
+                await pipeline.execute()
+        except redis.RedisError:
+            pass
+
+
+def invalidate_domain(domain: str) -> int:
+    """Bump the domain's data version. Called from the EL/dbt celery tasks."""
+    if not REDIS_URL:
+        return 0
+    with redis.Redis.from_url(REDIS_URL) as client:
+        return client.incr(data_version_key(domain))
+
+
+def get_data_version(domain: str) -> int:
+    """Synchronous counterpart of ChartCache.data_version for celery tasks."""
+    if not REDIS_URL:
+        return 0
+    with redis.Redis.from_url(REDIS_URL) as client:
+        return int(client.get(data_version_key(domain)) or 0)
+
+
+chart_cache = ChartCache(REDIS_URL, CHART_CACHE_TTL, CHART_CACHE_LOCAL_SIZE)
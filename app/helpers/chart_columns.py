@@ -0,0 +1,66 @@
+from operator import itemgetter
+
+MISSING = object()
+
+
+def get_column(rows, field: str) -> list:
+    """Return the values of a single result column as a list."""
+    if not rows:
+        return []
+    index = rows[0]._fields.index(field)
+    return list(map(itemgetter(index), rows))
+
+
+def name_value_pairs(names, values) -> list[dict]:
+    return [{"name": name, "value": value} for name, value in zip(names, values)]
+
+
+def stringify_rows(rows: list[dict]) -> list[dict]:
+    """Convert every value to a string, for charts configured with format: string."""
+    return [{key: str(value) for key, value in row.items()} for row in rows]
+
+
+def ordered_x_values(xs: list) -> list:
+    """Order of the rows of aligned series.
+
+    Categorical (string) x values keep the order in which the queries returned
+    them. Other values are sorted, NULLs last, as long as they all compare with
+    each other; otherwise the first-seen order is kept as well.
+    """
+    if any(isinstance(x, str) for x in xs):
+        return xs
+    present = [x for x in xs if x is not None]
+    try:
+        present.sort()
+    except TypeError:
+        return xs
+    return present + [None] * (len(present) != len(xs))
+
+
+def align_series(series, fill=MISSING) -> list[dict]:
+    """Outer join series on their x values with a hash join.
+
+    ``series`` is a list of (line name, xs, ys). Points are grouped by x in one
+    pass, so alignment is O(n) plus sorting the distinct x values where they
+    are ordered (see ordered_x_values). Lines without a point at some x get
+    ``fill``, or are left out of that row when no fill is configured.
+    """
+    line_names = [line_name for line_name, _, _ in series]
+    line_values_by_x = {}
+    for line_index, (_, xs, ys) in enumerate(series):
+        for x, y in zip(xs, ys):
+            line_values = line_values_by_x.get(x)
+            if line_values is None:
+                line_values = line_values_by_x[x] = [MISSING] * len(line_names)
+            line_values[line_index] = y
+
+    rows = []
+    for x in ordered_x_values(list(line_values_by_x)):
+        row = {"name": x}
+        for line_name, y in zip(line_names, line_values_by_x[x]):
+            if y is not MISSING:
+                row[line_name] = y
+            elif fill is not MISSING:
+                row[line_name] = fill
+        rows.append(row)
+    return rows
@@ -1,6 +1,15 @@
 from abc import ABC, abstractmethod
 
-from app.routers.admin.schemas.credentials import ChartType
+from app.helpers.chart_columns import (
+    MISSING,
+    align_series,
+    get_column,
+    name_value_pairs,
+    stringify_rows,
+)
+from app.helpers.downsampling import downsample_rows
+from app.helpers.sampling import chart_sample, sample_scale_factor, scale_rows
+from app.routers.admin.schemas.credentials import ChartType, ChartValueFormat
 
 
 class ChartDataGenerator(ABC):
@@ -8,95 +17,112 @@ class ChartDataGenerator(ABC):
     def generate_data(self, chart_config, data):
         pass
 
+    def present_values(self, chart_config, values: list[dict]) -> list[dict]:
+        sample = chart_sample(chart_config)
+        factor = sample and sample_scale_factor(chart_config, sample)
+        if factor:
+            values = scale_rows(values, factor)
+        return self.format_values(chart_config, values)
+
+    @staticmethod
+    def format_values(chart_config, values: list[dict]) -> list[dict]:
+        """Values keep their database types unless the chart asks for strings."""
+        if chart_config.get("format") == ChartValueFormat.string:
+            return stringify_rows(values)
+        return values
+
 
 class PieChartGenerator(ChartDataGenerator):
     def generate_data(self, chart_config, data):
-        label_field = chart_config["label_field"]
-        values = []
-        for query_result in data:
-            data = query_result._asdict()
-            values.append(
-                {
-                    "name": str(data[label_field]),
-                    "value": str(data[chart_config["metrics"]["column"]]),
-                }
-            )
+        values = name_value_pairs(
+            get_column(data, chart_config["label_field"]),
+            get_column(data, chart_config["metrics"]["column"]),
+        )
 
         return {
             "size": 1,
             "type": chart_config["type"],
-            "data": values,
+            "data": self.present_values(chart_config, values),
             "metrics": chart_config["metrics"],
         }
 
 
 class LineChartGenerator(ChartDataGenerator):
     def generate_data(self, chart_config, data):
-        values = []
-        for query_result in data:
-            data = query_result._asdict()
-            values.append(
-                {
-                    "name": str(data[chart_config["metrics"]["x-axis"]]),
-                    "value": str(data[chart_config["metrics"]["y-axis"]]),
-                }
-            )
+        x_field = chart_config["metrics"]["x-axis"]
+        y_field = chart_config["metrics"]["y-axis"]
+        data = downsample_rows(data, x_field, y_field, chart_config.get("max_points"))
+        values = name_value_pairs(get_column(data, x_field), get_column(data, y_field))
 
         return {
             "size": 1,
             "type": chart_config["type"],
-            "data": values,
+            "data": self.present_values(chart_config, values),
             "metrics": chart_config["metrics"],
         }
 
 
 class BarChartGenerator(ChartDataGenerator):
     def generate_data(self, chart_config, data):
-        values = []
-        for query_result in data:
-            data = query_result._asdict()
-            values.append(
-                {
-                    "name": str(data[chart_config["metrics"]["x-axis"]]),
-                    "value": str(data[chart_config["metrics"]["y-axis"]]),
-                }
-            )
+        values = name_value_pairs(
+            get_column(data, chart_config["metrics"]["x-axis"]),
+            get_column(data, chart_config["metrics"]["y-axis"]),
+        )
 
         return {
             "size": 1,
             "type": chart_config["type"],
-            "data": values,
+            "data": self.present_values(chart_config, values),
             "metrics": chart_config["metrics"],
         }
 
 
 class MultiLineChartGenerator(ChartDataGenerator):
+    @staticmethod
+    def split_series(chart_config, data):
+        """Return (line name, rows) pairs.
+
+        Charts with a ``series`` metric are fetched with a single grouped query
+        and split here by the series column; otherwise there is one result per
+        configured line.
+        """
+        series_field = chart_config["metrics"].get("series")
+        if series_field is None:
+            return [
+                (line["name"], queryset)
+                for line, queryset in zip(chart_config["lines"], data)
+            ]
+
+        series = {}
+        for name, row in zip(map(str, get_column(data, series_field)), data):
+            series.setdefault(name, []).append(row)
+        if chart_config.get("lines"):
+            return [
+                (line["name"], series.get(line["name"], []))
+                for line in chart_config["lines"]
+            ]
+        return list(series.items())
+
     def generate_data(self, chart_config, data):
-        values = {}
-        min_queryset = data[0]
-        for queryset in data:
-            if len(queryset) < len(min_queryset):
-                min_queryset = queryset
-
-        for line_index, queryset in enumerate(data):
-            for index, _ in enumerate(min_queryset):
-                single_node = queryset[index]._asdict()
-                line_name = chart_config["lines"][line_index]["name"]
-                name = str(single_node[chart_config["metrics"]["x-axis"]])
-                if name in values:
-                    values[name].update(
-                        {line_name: str(single_node[chart_config["metrics"]["y-axis"]])}
-                    )
-                else:
-                    values[name] = {
-                        "name": name,
-                        line_name: str(single_node[chart_config["metrics"]["y-axis"]]),
-                    }
+        x_field = chart_config["metrics"]["x-axis"]
+        y_field = chart_config["metrics"]["y-axis"]
+        max_points = chart_config.get("max_points")
+        series = [
+            (line_name, downsample_rows(rows, x_field, y_field, max_points))
+            for line_name, rows in self.split_series(chart_config, data)
+        ]
+        values = align_series(
+            [
+                (line_name, get_column(rows, x_field), get_column(rows, y_field))
+                for line_name, rows in series
+            ],
+            chart_config.get("fill", MISSING),
+        )
 
         return {
             "size": 1,
             "type": chart_config["type"],
-            "data": list(values.values()),
+            "data": self.present_values(chart_config, values),
             "metrics": chart_config["metrics"],
         }
 
@@ -104,6 +130,7 @@ class MultiLineChartGenerator(ChartDataGenerator):
 class ChartGeneratorFactory:
     CHART_GENERATOR = {
         ChartType.pie_no_center: PieChartGenerator(),
+        ChartType.pie_with_center: PieChartGenerator(),
         ChartType.single_line: LineChartGenerator(),
         ChartType.vertical_bar: BarChartGenerator(),
         ChartType.horizontal_bar: BarChartGenerator(),
@@ -0,0 +1,66 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+JSON_MEDIA_TYPE = "application/json"
+
+
+def accepted_media_types(accept: str | None) -> list[str]:
+    """Media types of an Accept header, most preferred first."""
+    if not accept:
+        return []
+    media_types = []
+    for position, media_range in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            media_types.append((-quality, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(media_types)]
+
+
+def chart_media_type(accept: str | None) -> str:
+    """Pick the chart payload encoding; JSON unless MessagePack is preferred."""
+    for media_type in accepted_media_types(accept):
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return MSGPACK_MEDIA_TYPE
+        if media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            return JSON_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def columnar_chart_data(chart_data: dict) -> dict:
+    """Transpose a chart's list of row dicts into one list per column.
+
+    Rows that do not have a column (e.g. multi-line charts without ``fill``)
+    get None in that column so every column has the same length.
+    """
+    rows = chart_data.get("data")
+    if not isinstance(rows, list):
+        return chart_data
+    column_names = list(dict.fromkeys(name for row in rows for name in row))
+    columns = {
+        column_name: [row.get(column_name) for row in rows]
+        for column_name in column_names
+    }
+    return {**chart_data, "data": columns, "layout": "columnar"}
+
+
+def msgpack_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(
+        f"Object of type {type(value).__name__} is not msgpack serializable"
+    )
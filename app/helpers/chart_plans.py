@@ -0,0 +1,206 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from pydantic import TypeAdapter
+from pydantic import ValidationError as SchemaValidationError
+
+from app.helpers import messages
+from app.helpers.chart_cache import config_hash
+from app.helpers.chart_data_factory import ChartDataGenerator, ChartGeneratorFactory
+from app.helpers.exceptions import ValidationError
+from app.helpers.materialized_views import query_source_sql
+from app.helpers.sampling import chart_sample, sample_sql
+from app.routers.admin.schemas.credentials import ChartConfigSchema, ChartType
+from app.settings import CHART_PLAN_CACHE_SIZE
+
+MULTI_QUERY_CHART_TYPES = [
+    ChartType.multi_line.value,
+    ChartType.radar.value,
+    ChartType.radar_bar.value,
+    ChartType.composed.value,
+    ChartType.area.value,
+]
+
+# set per request (or by the config loader) on top of the stored config, never
+# part of a compiled plan
+REQUEST_CONFIG_KEYS = (
+    "page",
+    "since",
+    "max_points",
+    "timeout",
+    "plan",
+    "format",
+    "chart_version",
+)
+
+
+def chart_version(chart) -> str | None:
+    """Version of a stored chart; the model's updated_at changes on every save."""
+    return chart.updated_at.isoformat() if chart.updated_at else None
+
+
+def is_sql_chart(chart_config) -> bool:
+    """Whether the chart runs its own sql; legacy charts are built from source_table."""
+    return bool(chart_config.get("sql") or chart_config.get("lines"))
+
+
+def is_multi_query_chart(chart_config) -> bool:
+    return (
+        chart_config["type"] in MULTI_QUERY_CHART_TYPES
+        and "series" not in chart_config["metrics"]
+    )
+
+
+@dataclass(frozen=True)
+class ChartStatement:
+    identity: str
+    sql: str
+
+
+@dataclass(frozen=True)
+class ChartPlan:
+    """A stored chart config compiled for execution.
+
+    Holds everything the request path would otherwise work out again from the
+    config dict on every view: the generator and the source SQL of each
+    statement (materialized view and sampling applied).
+    Paging, deltas and time buckets are request parameters and are applied on
+    top of ``statements`` by the caller.
+    """
+
+    chart_id: int | None
+    version: str | None
+    generator: ChartDataGenerator
+    statements: tuple[ChartStatement, ...]
+    multi_query: bool
+    sample: dict | None
+
+
+def chart_query_configs(chart_config) -> list[dict]:
+    return (
+        chart_config["lines"] if is_multi_query_chart(chart_config) else [chart_config]
+    )
+
+
+def compile_chart_plan(chart_config, version: str | None = None) -> ChartPlan:
+    """Compile a chart config, validated by validate_chart_configs, into a ChartPlan.
+
+    Raises ValueError for chart types without a chart data generator.
+    """
+    chart_config = {
+        key: value
+        for key, value in chart_config.items()
+        if key not in REQUEST_CONFIG_KEYS
+    }
+    generator = ChartGeneratorFactory.get_chart_data(chart_config["type"])
+    if generator is None:
+        raise ValueError(messages.UNSUPPORTED_CHART_TYPE)
+    query_configs = chart_query_configs(chart_config)
+
+    # statements of each chart version are prefixed with their own identity, so
+    # every version maps to one asyncpg prepared statement cache entry (and is
+    # visible in pg_stat_statements); entries of replaced versions age out
+    chart_id = chart_config.get("chart_id", "-")
+    digest = config_hash(chart_config)[:16]
+    multi_query = is_multi_query_chart(chart_config)
+    statements = tuple(
+        ChartStatement(
+            identity=(
+                f"/* chart {chart_id} line {line_index} {digest} */ "
+                if multi_query
+                else f"/* chart {chart_id} {digest} */ "
+            ),
+            sql=sample_sql(chart_config, query_source_sql(query_config)),
+        )
+        for line_index, query_config in enumerate(query_configs)
+    )
+    return ChartPlan(
+        chart_id=chart_config.get("chart_id"),
+        version=version,
+        generator=generator,
+        statements=statements,
+        multi_query=multi_query,
+        sample=chart_sample(chart_config),
+    )
+
+
+chart_config_adapter = TypeAdapter(ChartConfigSchema)
+
+
+def validate_chart_configs(chart_data: list[dict]):
+    """Validate the charts of an uploaded dashboard config against ChartConfigSchema.
+
+    Sql charts must also have a chart data generator for their type; legacy
+    source_table charts are rendered by ChartFactory instead. Raises
+    ValidationError listing the errors of every invalid chart.
+    """
+    errors = []
+    try:
+        chart_config_adapter.validate_python(chart_data)
+    except SchemaValidationError as error:
+        for detail in error.errors():
+            # loc is (chart index, chart type, *field path)
+            field = ".".join(str(part) for part in detail["loc"][2:])
+            errors.append(
+                chart_config_error(
+                    chart_data[detail["loc"][0]],
+                    f"{field}: {detail['msg']}" if field else detail["msg"],
+                )
+            )
+    chart_types = [chart_type.value for chart_type in ChartType]
+    for config in chart_data:
+        if (
+            is_sql_chart(config)
+            and config.get("type") in chart_types
+            and ChartGeneratorFactory.get_chart_data(config["type"]) is None
+        ):
+            errors.append(chart_config_error(config, messages.UNSUPPORTED_CHART_TYPE))
+    if errors:
+        raise ValidationError(messages.INVALID_CHART_CONFIG, errors=errors)
+
+
+def chart_config_error(chart_config, message: str) -> dict:
+    return {
+        "dashboard_chart_unique_identifier": chart_config.get(
+            "dashboard_chart_unique_identifier"
+        ),
+        "message": message,
+    }
+
+
+class ChartPlanCache:
+    """In-process LRU of compiled plans keyed by chart id and chart version.
+
+    Plans are put here when charts are saved; other workers compile a plan on
+    its first view. A saved config gets a new version, so stale plans are never
+    read again and are evicted.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._plans: OrderedDict[tuple, ChartPlan] = OrderedDict()
+
+    def put(self, plan: ChartPlan):
+        if plan.chart_id is None or plan.version is None:
+            return
+        key = (plan.chart_id, plan.version)
+        self._plans[key] = plan
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.max_size:
+            self._plans.popitem(last=False)
+
+    def get(self, chart_config) -> ChartPlan:
+        key = (chart_config.get("chart_id"), chart_config.get("chart_version"))
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+            return plan
+        plan = compile_chart_plan(chart_config, chart_config.get("chart_version"))
+        self.put(plan)
+        return plan
+
+    def clear(self):
+        self._plans.clear()
+
+
+chart_plans = ChartPlanCache(CHART_PLAN_CACHE_SIZE)
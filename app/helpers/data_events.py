@@ -0,0 +1,90 @@
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import redis
+from redis import asyncio as aioredis
+
+from app.settings import REDIS_URL
+
+DATA_CHANGED_CHANNEL = "chart_data_changed:{domain}"
+SSE_HEARTBEAT_INTERVAL = 15
+RECONNECT_DELAY = 1
+
+
+def data_changed_channel(domain: str) -> str:
+    return DATA_CHANGED_CHANNEL.format(domain=domain)
+
+
+def publish_data_changed(domain: str, data_version: int):
+    """Announce new data for a domain. Called from celery tasks."""
+    if not REDIS_URL:
+        return
+    event = {"domain": domain, "data_version": data_version}
+    with redis.Redis.from_url(REDIS_URL) as client:
+        client.publish(data_changed_channel(domain), json.dumps(event))
+
+
+def server_sent_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class DataChangeBroadcaster:
+    """Fans data changed events out from Redis pub/sub to connected clients.
+
+    The API process holds a single pattern subscription however many clients
+    are connected; every client gets its own queue per domain. A client only
+    needs to know that something changed, so a slow client keeps just the
+    latest event.
+    """
+
+    def __init__(self, redis_url: str | None):
+        self.redis_url = redis_url
+        self._subscribers: defaultdict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._listener: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def subscribe(self, domain: str):
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers[domain].add(queue)
+        self._ensure_listener()
+        try:
+            yield queue
+        finally:
+            self._subscribers[domain].discard(queue)
+            if not self._subscribers[domain]:
+                del self._subscribers[domain]
+
+    def dispatch(self, event: dict):
+        for queue in self._subscribers.get(event.get("domain"), ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def _ensure_listener(self):
+        if self.redis_url and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            client = aioredis.Redis.from_url(self.redis_url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(data_changed_channel("*"))
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self.dispatch(json.loads(message["data"]))
+            except (redis.RedisError, ValueError):
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+
+data_change_broadcaster = DataChangeBroadcaster(REDIS_URL)
@@ -0,0 +1,79 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.helpers.chart_columns import get_column
+
+
+def as_number(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return value.toordinal()
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not a numeric value")
+
+
+def largest_triangle_three_buckets(xs, ys, threshold: int) -> list[int]:
+    """Return indices of the points kept by the LTTB algorithm.
+
+    First and last points are always kept; every bucket in between contributes
+    the point forming the largest triangle with the previously selected point
+    and the average of the next bucket.
+    """
+    length = len(xs)
+    if threshold >= length or threshold < 3:
+        return list(range(length))
+
+    sampled = [0]
+    bucket_size = (length - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        bucket_start = int(bucket * bucket_size) + 1
+        bucket_end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, length)
+        if bucket_end >= next_end:
+            avg_x, avg_y = xs[-1], ys[-1]
+        else:
+            next_size = next_end - bucket_end
+            avg_x = sum(xs[bucket_end:next_end]) / next_size
+            avg_y = sum(ys[bucket_end:next_end]) / next_size
+
+        selected_x, selected_y = xs[selected], ys[selected]
+        max_area = -1
+        max_index = bucket_start
+        for index in range(bucket_start, bucket_end):
+            area = abs(
+                (selected_x - avg_x) * (ys[index] - selected_y)
+                - (selected_x - xs[index]) * (avg_y - selected_y)
+            )
+            if area > max_area:
+                max_area = area
+                max_index = index
+
+        sampled.append(max_index)
+        selected = max_index
+
+    sampled.append(length - 1)
+    return sampled
+
+
+def downsample_rows(rows, x_field: str, y_field: str, max_points: int | None):
+    """Downsample query rows of a single series to at most max_points rows.
+
+    Non numeric x values (e.g. categories) are replaced by their position. Rows
+    are returned untouched when the y values are not numeric.
+    """
+    if not max_points or len(rows) <= max_points:
+        return rows
+
+    try:
+        ys = list(map(as_number, get_column(rows, y_field)))
+    except TypeError:
+        return rows
+    try:
+        xs = list(map(as_number, get_column(rows, x_field)))
+    except TypeError:
+        xs = list(range(len(rows)))
+
+    return [rows[index] for index in largest_triangle_three_buckets(xs, ys, max_points)]
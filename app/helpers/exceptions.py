@@ -104,6 +104,24 @@ class NotFound(ServiceException):
     code = "NOT_FOUND"
 
 
+class ClientDisconnected(ServiceException):
+    status_code = 499
+    message = "Client Closed Request"
+    code = "CLIENT_DISCONNECTED"
+
+
+class QueryQueueFull(ServiceException):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    message = messages.CHART_QUERY_QUEUE_FULL
+    code = "QUERY_QUEUE_FULL"
+
+
+class TenantEnginesBusy(ServiceException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    message = messages.TENANT_ENGINES_BUSY
+    code = "TENANT_ENGINES_BUSY"
+
+
 class MeltanoError(ServiceException):
     status_code = status.HTTP_409_CONFLICT
     message = "Meltano Error"
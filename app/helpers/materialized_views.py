@@ -0,0 +1,128 @@
+import hashlib
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+
+from app.helpers.pagination import chart_keyset_column
+from app.helpers.tenant_engines import tenant_engines
+from app.settings import DB_HOST, DB_PASSWORD, DB_PORT, DB_USER
+
+MATERIALIZED_VIEW_PREFIX = "chart_mv_"
+
+MATERIALIZED_VIEWS_SQL = """
+SELECT mv.matviewname AS name, EXISTS (
+    SELECT 1 FROM pg_index idx
+    JOIN pg_class cls ON cls.oid = idx.indrelid
+    WHERE cls.relname = mv.matviewname AND idx.indisunique
+) AS has_unique_index
+FROM pg_matviews mv
+WHERE mv.matviewname LIKE :pattern
+"""
+
+
+def materialized_view_name(
+    dashboard_id: int, chart_identifier: str, line_index: int | None = None
+) -> str:
+    identifier = f"{chart_identifier}:{line_index}"
+    digest = hashlib.md5(identifier.encode("utf-8")).hexdigest()[:16]
+    return f"{MATERIALIZED_VIEW_PREFIX}{dashboard_id}_{digest}"
+
+
+def materialized_view_pattern(dashboard_id: int | None = None) -> str:
+    prefix = MATERIALIZED_VIEW_PREFIX.replace("_", r"\_")
+    if dashboard_id is None:
+        return f"{prefix}%"
+    return f"{prefix}{dashboard_id}\\_%"
+
+
+def query_source_sql(query_config: dict) -> str:
+    """SQL a chart (or chart line) reads from, the materialized view when present."""
+    if query_config.get("materialized_view"):
+        return f'SELECT * FROM "{query_config["materialized_view"]}"'
+    return query_config["sql"]
+
+
+async def create_materialized_view(connection, name: str, sql: str, key_column):
+    await connection.execute(text(f'DROP MATERIALIZED VIEW IF EXISTS "{name}"'))
+    await connection.execute(
+        text(f'CREATE MATERIALIZED VIEW "{name}" AS {sql.strip().rstrip(";")}')
+    )
+    if not key_column:
+        return
+    # a unique index allows REFRESH ... CONCURRENTLY; not every chart query has one
+    try:
+        async with connection.begin_nested():
+            await connection.execute(
+                text(f'CREATE UNIQUE INDEX ON "{name}" ("{key_column}")')
+            )
+    except DBAPIError:
+        pass
+
+
+async def create_chart_materialized_views(
+    domain: str, dashboard_id: int, chart_data: list[dict]
+) -> list[dict]:
+    """Create materialized views for charts flagged with ``materialize: true``.
+
+    Returns chart configs pointing at their views. Views of charts that are no
+    longer materialized (or were removed from the dashboard) are dropped.
+    """
+    materialized_chart_data = []
+    view_names = set()
+    async with tenant_engines.lease(domain) as engine, engine.begin() as connection:
+        for config in chart_data:
+            if not config.get("materialize"):
+                materialized_chart_data.append(config)
+                continue
+
+            config = dict(config)
+            identifier = config["dashboard_chart_unique_identifier"]
+            key_column = chart_keyset_column(config)
+            if "sql" not in config:
+                config["lines"] = [dict(line) for line in config["lines"]]
+                query_configs = [
+                    (line, materialized_view_name(dashboard_id, identifier, index))
+                    for index, line in enumerate(config["lines"])
+                ]
+            else:
+                query_configs = [
+                    (config, materialized_view_name(dashboard_id, identifier))
+                ]
+            for query_config, name in query_configs:
+                await create_materialized_view(
+                    connection, name, query_config["sql"], key_column
+                )
+                query_config["materialized_view"] = name
+                view_names.add(name)
+            materialized_chart_data.append(config)
+
+        existing_views = await connection.execute(
+            text(MATERIALIZED_VIEWS_SQL),
+            {"pattern": materialized_view_pattern(dashboard_id)},
+        )
+        for view in existing_views.fetchall():
+            if view.name not in view_names:
+                await connection.execute(
+                    text(f'DROP MATERIALIZED VIEW IF EXISTS "{view.name}"')
+                )
+    return materialized_chart_data
+
+
+def refresh_materialized_views(domain: str):
+    """Refresh every chart materialized view of a tenant. Runs in celery tasks."""
+    engine = create_engine(
+        f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{domain}",
+        isolation_level="AUTOCOMMIT",
+    )
+    try:
+        with engine.connect() as connection:
+            views = connection.execute(
+                text(MATERIALIZED_VIEWS_SQL), {"pattern": materialized_view_pattern()}
+            ).fetchall()
+            for view in views:
+                concurrently = "CONCURRENTLY " if view.has_unique_index else ""
+                connection.execute(
+                    text(f'REFRESH MATERIALIZED VIEW {concurrently}"{view.name}"')
+                )
+    finally:
+        engine.dispose()
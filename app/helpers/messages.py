@@ -19,6 +19,22 @@ USER_EXISTS = "User already exists"
 DASHBOARD_MEMBER_ALREADY_EXIST = "User already has been asigned to this dashboard."
 USER_NOT_FOUND = "User not found."
 DASHBOARD_NAME_NOT_FOUND = "Dashboard name not found."
+CHART_NOT_FOUND = "Chart not found."
+INVALID_CURSOR = "Invalid pagination cursor."
+INVALID_KEYSET_COLUMN = "Invalid keyset column."
+KEYSET_TIEBREAKER_REQUIRED = (
+    "Chart has no keyset tiebreaker column for cursor pagination."
+)
+CHART_QUERY_TIMEOUT = "Chart query exceeded its time budget."
+CHART_QUERY_FAILED = "Chart query failed."
+CHART_QUERY_REJECTED = "Chart queries were rejected."
+CHART_PLAN_COST_EXCEEDED = "Estimated query cost exceeds the configured limit."
+WATERMARK_NOT_CONFIGURED = "Chart has no watermark column for incremental refresh."
+TENANT_ENGINES_BUSY = "All tenant database connections are in use."
+CHART_QUERY_QUEUE_FULL = "Too many chart queries are waiting for this organization."
+DELTA_WITH_PAGINATION = "Incremental refresh can not be combined with pagination."
+INVALID_CHART_CONFIG = "Chart configs are invalid."
+UNSUPPORTED_CHART_TYPE = "Charts of this type can not be rendered from sql."
 
 
 class EmailSubjects:
@@ -0,0 +1,108 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.helpers import messages
+from app.helpers.exceptions import ValidationError
+
+CURSOR_DECODERS = {
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "decimal": Decimal,
+    "value": lambda value: value,
+    "tuple": lambda values: tuple(decode_cursor_value(value) for value in values),
+}
+
+
+def encode_cursor_value(value) -> dict:
+    if isinstance(value, tuple):
+        return {"type": "tuple", "value": [encode_cursor_value(item) for item in value]}
+    if isinstance(value, datetime):
+        return {"type": "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {"type": "date", "value": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"type": "decimal", "value": str(value)}
+    return {"type": "value", "value": value}
+
+
+def decode_cursor_value(cursor: dict):
+    return CURSOR_DECODERS[cursor["type"]](cursor["value"])
+
+
+def encode_cursor(value) -> str:
+    """Encode a keyset value into an opaque cursor, keeping its python type.
+
+    A tuple encodes a (key, tiebreaker) position.
+    """
+    cursor = encode_cursor_value(value)
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        decoded_cursor = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return decode_cursor_value(decoded_cursor)
+    except (binascii.Error, json.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise ValidationError(messages.INVALID_CURSOR)
+
+
+def chart_keyset_column(chart_config) -> str | None:
+    return (
+        chart_config.get("keyset_column")
+        or chart_config["metrics"].get("x-axis")
+        or chart_config.get("label_field")
+    )
+
+
+def chart_keyset_tiebreaker(chart_config) -> str | None:
+    """Unique column that orders rows sharing a keyset value.
+
+    Keyset cursors are only issued for charts that configure one, since rows with
+    a duplicate key on a page boundary would otherwise be skipped.
+    """
+    return chart_config.get("keyset_tiebreaker")
+
+
+def paginate_sql(
+    sql: str,
+    key_column: str | None,
+    limit: int | None = None,
+    offset: int | None = None,
+    after: str | None = None,
+    tiebreaker_column: str | None = None,
+    inclusive: bool = False,
+) -> tuple[str, dict]:
+    """Wrap chart SQL so that keyset and limit/offset run inside Postgres.
+
+    With a tiebreaker column the keyset is the (key, tiebreaker) row, so the
+    cursor is a tuple of both values. ``inclusive`` keeps the rows at the
+    cursor itself.
+    """
+    params = {}
+    query = f"SELECT * FROM ({sql.strip().rstrip(';')}) AS chart_page"
+    if key_column:
+        columns = [key_column] + ([tiebreaker_column] if tiebreaker_column else [])
+        if any('"' in column for column in columns):
+            raise ValidationError(messages.INVALID_KEYSET_COLUMN)
+        keyset = ", ".join(f'chart_page."{column}"' for column in columns)
+        if after is not None:
+            if tiebreaker_column:
+                position = decode_cursor(after)
+                if not isinstance(position, tuple) or len(position) != 2:
+                    raise ValidationError(messages.INVALID_CURSOR)
+                query += f" WHERE ({keyset}) > (:after, :after_tiebreaker)"
+                params["after"], params["after_tiebreaker"] = position
+            else:
+                query += f" WHERE {keyset} {'>=' if inclusive else '>'} :after"
+                params["after"] = decode_cursor(after)
+        query += f" ORDER BY {keyset}"
+    if limit:
+        query += " LIMIT :limit"
+        params["limit"] = limit
+    if offset:
+        query += " OFFSET :offset"
+        params["offset"] = offset
+    return query, params
@@ -0,0 +1,115 @@
+import json
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.helpers import messages
+from app.helpers.exceptions import ValidationError
+from app.helpers.sampling import sample_sql
+from app.helpers.tenant_engines import tenant_engines
+from app.helpers.time_buckets import chart_bucket_sql
+from app.settings import (
+    CHART_PLAN_COST_LIMIT,
+    CHART_PLAN_COST_WARNING,
+    CHART_SEQ_SCAN_COST_WARNING,
+)
+
+
+def seq_scan_tables(plan: dict) -> set[str]:
+    """Tables read with an expensive sequential scan, i.e. lacking a useful index."""
+    tables = set()
+    if (
+        plan.get("Node Type") == "Seq Scan"
+        and plan.get("Total Cost", 0) >= CHART_SEQ_SCAN_COST_WARNING
+    ):
+        tables.add(plan["Relation Name"])
+    for sub_plan in plan.get("Plans", []):
+        tables |= seq_scan_tables(sub_plan)
+    return tables
+
+
+async def explain_query(connection, sql: str) -> dict:
+    result = await connection.execute(
+        text(f"EXPLAIN (FORMAT JSON) {sql.strip().rstrip(';')}")
+    )
+    query_plan = result.scalar()
+    if isinstance(query_plan, str):
+        query_plan = json.loads(query_plan)
+    plan = query_plan[0]["Plan"]
+    return {
+        "total_cost": plan["Total Cost"],
+        "plan_rows": plan["Plan Rows"],
+        "seq_scan_tables": seq_scan_tables(plan),
+    }
+
+
+def plan_level(chart_config: dict, total_cost: float) -> str:
+    # materialized charts pay the query cost on refresh, not on view
+    if total_cost >= CHART_PLAN_COST_LIMIT and not chart_config.get("materialize"):
+        return "error"
+    if total_cost >= CHART_PLAN_COST_WARNING:
+        return "warning"
+    return "ok"
+
+
+async def analyze_chart_queries(domain: str, chart_data: list[dict]) -> list[dict]:
+    """Run EXPLAIN for every chart query of an uploaded dashboard config.
+
+    Returns chart configs with the estimated cost recorded under ``plan`` and
+    raises ValidationError listing the offending charts when a query is invalid
+    or estimated above CHART_PLAN_COST_LIMIT.
+    """
+    analyzed_chart_data = []
+    errors = []
+    async with tenant_engines.lease(domain) as engine, engine.connect() as connection:
+        for config in chart_data:
+            identifier = config.get("dashboard_chart_unique_identifier")
+            query_configs = [config] if "sql" in config else config.get("lines", [])
+            plan = {"total_cost": 0, "plan_rows": 0, "seq_scan_tables": set()}
+            try:
+                for query_config in query_configs:
+                    async with connection.begin_nested():
+                        sql = sample_sql(config, query_config["sql"])
+                        query_plan = await explain_query(
+                            connection, chart_bucket_sql(config, sql)
+                        )
+                    plan["total_cost"] += query_plan["total_cost"]
+                    plan["plan_rows"] += query_plan["plan_rows"]
+                    plan["seq_scan_tables"] |= query_plan["seq_scan_tables"]
+            except DBAPIError as error:
+                errors.append(
+                    {
+                        "dashboard_chart_unique_identifier": identifier,
+                        "message": str(error.orig),
+                    }
+                )
+                continue
+
+            plan["seq_scan_tables"] = sorted(plan["seq_scan_tables"])
+            plan["level"] = plan_level(config, plan["total_cost"])
+            if plan["level"] == "error":
+                errors.append(
+                    {
+                        "dashboard_chart_unique_identifier": identifier,
+                        "message": messages.CHART_PLAN_COST_EXCEEDED,
+                        "plan": plan,
+                    }
+                )
+            analyzed_chart_data.append({**config, "plan": plan})
+
+    if errors:
+        raise ValidationError(messages.CHART_QUERY_REJECTED, errors=errors)
+    return analyzed_chart_data
+
+
+def chart_plan_report(chart_data: list[dict]) -> list[dict]:
+    return [
+        {
+            "dashboard_chart_unique_identifier": config.get(
+                "dashboard_chart_unique_identifier"
+            ),
+            **config["plan"],
+        }
+        for config in chart_data
+        if config.get("plan")
+    ]
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from app.helpers.exceptions import QueryQueueFull
+from app.settings import (
+    TENANT_DB_MAX_CONNECTIONS,
+    TENANT_QUERY_CONCURRENCY,
+    TENANT_QUERY_QUEUE_LIMIT,
+    TENANT_QUERY_WEIGHTS,
+)
+
+
+@dataclass
+class QueueWaitStats:
+    queries: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    rejected: int = 0
+
+    def record(self, wait: float):
+        self.queries += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class TenantQueryScheduler:
+    """Weighted fair admission of tenant queries.
+
+    At most ``max_running`` queries run across all tenants and at most
+    ``domain_concurrency`` per tenant, with up to ``queue_limit`` more waiting
+    per tenant. A free slot goes to the waiting tenant with the lowest virtual
+    time (queries started divided by its weight), so one tenant with a long
+    queue can not starve the others. Idle tenants do not bank credit: their
+    virtual time catches up with the scheduler's when they become active.
+    """
+
+    def __init__(
+        self,
+        max_running: int,
+        domain_concurrency: int,
+        queue_limit: int,
+        weights: dict[str, float] | None = None,
+    ):
+        self.max_running = max_running
+        self.domain_concurrency = domain_concurrency
+        self.queue_limit = queue_limit
+        self.weights = weights or {}
+        self._running_total = 0
+        self._running: defaultdict[str, int] = defaultdict(int)
+        self._queues: defaultdict[str, deque[asyncio.Future]] = defaultdict(deque)
+        self._virtual_times: defaultdict[str, float] = defaultdict(float)
+        self._virtual_time = 0.0
+        self._wait_stats: defaultdict[str, QueueWaitStats] = defaultdict(QueueWaitStats)
+
+    def weight(self, domain: str) -> float:
+        return self.weights.get(domain, 1)
+
+    def _can_start(self, domain: str) -> bool:
+        return (
+            self._running_total < self.max_running
+            and self._running[domain] < self.domain_concurrency
+        )
+
+    def _virtual_start(self, domain: str) -> float:
+        return max(self._virtual_times[domain], self._virtual_time)
+
+    def _start(self, domain: str):
+        self._running_total += 1
+        self._running[domain] += 1
+        self._virtual_time = self._virtual_start(domain)
+        self._virtual_times[domain] = self._virtual_time + 1 / self.weight(domain)
+
+    def _dispatch(self):
+        while self._running_total < self.max_running:
+            for queue in self._queues.values():
+                # waiters cancelled before their own cleanup ran
+                while queue and queue[0].done():
+                    queue.popleft()
+            waiting = [
+                domain
+                for domain, queue in self._queues.items()
+                if queue and self._running[domain] < self.domain_concurrency
+            ]
+            if not waiting:
+                return
+            domain = min(waiting, key=self._virtual_start)
+            self._start(domain)
+            self._queues[domain].popleft().set_result(None)
+
+    async def acquire(self, domain: str):
+        queue = self._queues[domain]
+        # other tenants only wait while they are at their own limit, so a free
+        # slot can be taken right away without breaking fairness
+        if not queue and self._can_start(domain):
+            self._start(domain)
+            self._wait_stats[domain].record(0.0)
+            return
+        if len(queue) >= self.queue_limit:
+            self._wait_stats[domain].rejected += 1
+            raise QueryQueueFull()
+
+        enqueued_at = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                if future in queue:
+                    queue.remove(future)
+            else:
+                # the slot was granted just before the waiter got cancelled
+                self.release(domain)
+            raise
+        self._wait_stats[domain].record(time.monotonic() - enqueued_at)
+
+    def release(self, domain: str):
+        self._running_total -= 1
+        self._running[domain] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, domain: str):
+        await self.acquire(domain)
+        try:
+            yield
+        finally:
+            self.release(domain)
+
+    def slots(self, domain: str, concurrency: int) -> "TenantQuerySlots":
+        return TenantQuerySlots(self, domain, concurrency)
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            domain: {
+                "running": self._running[domain],
+                "queued": len(self._queues[domain]),
+                "weight": self.weight(domain),
+                "queries": wait_stats.queries,
+                "rejected": wait_stats.rejected,
+                "average_wait": (
+                    wait_stats.total_wait / wait_stats.queries
+                    if wait_stats.queries
+                    else 0.0
+                ),
+                "max_wait": wait_stats.max_wait,
+            }
+            for domain, wait_stats in self._wait_stats.items()
+        }
+
+
+class TenantQuerySlots:
+    """Query limit of a single dashboard load in front of the shared scheduler."""
+
+    def __init__(self, scheduler: TenantQueryScheduler, domain: str, concurrency: int):
+        self.scheduler = scheduler
+        self.domain = domain
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            await self.scheduler.acquire(self.domain)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        self.scheduler.release(self.domain)
+        self._semaphore.release()
+
+
+query_scheduler = TenantQueryScheduler(
+    max_running=TENANT_DB_MAX_CONNECTIONS,
+    domain_concurrency=TENANT_QUERY_CONCURRENCY,
+    queue_limit=TENANT_QUERY_QUEUE_LIMIT,
+    weights=TENANT_QUERY_WEIGHTS,
+)
@@ -1,5 +1,41 @@
+from decimal import Decimal
+
+import msgpack
+import orjson
 from fastapi import status
 from fastapi.responses import JSONResponse
+from fastapi.responses import Response as BaseResponse
+from pydantic import BaseModel
+
+from app.helpers.chart_encoding import MSGPACK_MEDIA_TYPE, msgpack_default
+
+
+def json_default(value):
+    """Types orjson does not serialize natively (datetimes, enums, UUIDs are)."""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def build_payload(payload=None, message=None, debug_message=None, **kwargs) -> dict:
+    payload = payload or {}
+    if kwargs.get("data") is not None:
+        payload["data"] = kwargs.get("data")
+    if message:
+        payload["message"] = message
+    if debug_message:
+        payload["debug_message"] = debug_message
+    if "code" in kwargs:
+        payload["code"] = kwargs.get("code")
+    if "meta_data" in kwargs:
+        if not isinstance(kwargs.get("meta_data"), dict):
+            raise ValueError("meta_data is not a dict object")
+        payload["metaData"] = kwargs.get("meta_data")
+    return payload
 
 
 class Response(JSONResponse):
@@ -9,19 +45,45 @@ class Response(JSONResponse):
         message=None,
         debug_message=None,
         status_code=status.HTTP_200_OK,
-        **kwargs
+        headers=None,
+        **kwargs,
+    ):
+        payload = build_payload(payload, message, debug_message, **kwargs)
+        super().__init__(content=payload, status_code=status_code, headers=headers)
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content, default=json_default, option=orjson.OPT_NON_STR_KEYS
+        )
+
+
+class MsgPackResponse(BaseResponse):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def __init__(
+        self,
+        payload=None,
+        message=None,
+        debug_message=None,
+        status_code=status.HTTP_200_OK,
+        headers=None,
+        **kwargs,
     ):
-        payload = payload or {}
-        if kwargs.get("data") is not None:
-            payload["data"] = kwargs.get("data")
-        if message:
-            payload["message"] = message
-        if debug_message:
-            payload["debug_message"] = debug_message
-        if "code" in kwargs:
-            payload["code"] = kwargs.get("code")
-        if "meta_data" in kwargs:
-            if not isinstance(kwargs.get("meta_data"), dict):
-                raise ValueError("meta_data is not a dict object")
-            payload["metaData"] = kwargs.get("meta_data")
-        super().__init__(content=payload, status_code=status_code)
+        payload = build_payload(payload, message, debug_message, **kwargs)
+        super().__init__(content=payload, status_code=status_code, headers=headers)
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, default=msgpack_default)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def not_modified_response(headers: dict) -> BaseResponse:
+    return BaseResponse(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,116 @@
+import re
+from decimal import Decimal
+
+from app.routers.admin.schemas.credentials import (
+    ChartAggregate,
+    ChartSampleMethod,
+    ChartType,
+)
+
+SAMPLED_CHART_TYPES = [
+    ChartType.pie_no_center.value,
+    ChartType.pie_with_center.value,
+    ChartType.horizontal_bar.value,
+    ChartType.vertical_bar.value,
+]
+
+# aggregates that grow with the number of sampled rows
+SCALED_AGGREGATES = [ChartAggregate.sum.value, ChartAggregate.count.value]
+
+# words that may follow a table reference but are not an alias
+NOT_ALIASES = (
+    "where|group|order|limit|offset|having|window|union|except|intersect|join|"
+    "inner|left|right|full|cross|natural|lateral|on|using|fetch|for|tablesample"
+)
+TABLE_REFERENCE = (
+    r"\b(?P<keyword>from|join)\s+(?P<table>{table})"
+    r"(?P<alias>\s+(?:as\s+)?(?!(?:{not_aliases})\b)[a-z_][a-z0-9_]*)?"
+    r"(?=[\s;),]|$)"
+)
+
+
+def chart_sample(chart_config) -> dict | None:
+    """The chart's sample settings when sampling applies to its query.
+
+    Materialized charts are read from their (already small) view and are never
+    sampled.
+    """
+    sample = chart_config.get("sample")
+    if (
+        not sample
+        or chart_config["type"] not in SAMPLED_CHART_TYPES
+        or chart_config.get("materialized_view")
+    ):
+        return None
+    table = sample.get("table") or chart_config.get("source_table")
+    if not table:
+        return None
+    if "sql" in chart_config and not table_reference_pattern(table).search(
+        chart_config["sql"]
+    ):
+        return None
+    return {**sample, "table": table}
+
+
+def table_reference_pattern(table: str) -> re.Pattern:
+    return re.compile(
+        TABLE_REFERENCE.format(table=re.escape(table), not_aliases=NOT_ALIASES),
+        re.IGNORECASE,
+    )
+
+
+def tablesample_clause(sample: dict) -> str:
+    method = ChartSampleMethod(sample.get("method", ChartSampleMethod.system)).value
+    clause = f" TABLESAMPLE {method.upper()} ({float(sample['percent'])})"
+    if sample.get("seed") is not None:
+        # a fixed seed keeps results stable between refreshes and cache entries
+        clause += f" REPEATABLE ({int(sample['seed'])})"
+    return clause
+
+
+def sample_sql(chart_config, sql: str) -> str:
+    """Add TABLESAMPLE to every reference of the chart's sampled table."""
+    sample = chart_sample(chart_config)
+    if sample is None:
+        return sql
+    clause = tablesample_clause(sample)
+    return table_reference_pattern(sample["table"]).sub(
+        lambda match: (
+            f"{match['keyword']} {match['table']}{match['alias'] or ''}{clause}"
+        ),
+        sql,
+    )
+
+
+def sample_rate(sample: dict) -> float:
+    return float(sample["percent"]) / 100
+
+
+def sample_scale_factor(chart_config, sample: dict) -> float | None:
+    """Factor turning sampled values into full table estimates, if they scale.
+
+    Only counts and sums grow with the sample, and the chart SQL may aggregate
+    anything, so charts opt in with ``scale: true``. Time bucketed charts are
+    never scaled unless their bucket aggregate is a sum or count.
+    """
+    if not sample.get("scale"):
+        return None
+    aggregate = chart_config.get("aggregate", ChartAggregate.sum.value)
+    if chart_config.get("granularity") and aggregate not in SCALED_AGGREGATES:
+        return None
+    return 1 / sample_rate(sample)
+
+
+def scale_rows(rows: list[dict], factor: float) -> list[dict]:
+    """Scale the value of name/value rows by factor."""
+    return [{**row, "value": scale_value(row["value"], factor)} for row in rows]
+
+
+def scale_value(value, factor: float):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return round(value * factor)
+    if isinstance(value, (float, Decimal)):
+        return float(value) * factor
+    return value
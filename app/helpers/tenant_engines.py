@@ -0,0 +1,224 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.helpers.exceptions import TenantEnginesBusy
+from app.settings import (
+    DB_HOST,
+    DB_PASSWORD,
+    DB_PORT,
+    DB_USER,
+    TENANT_DB_ENGINE_WAIT,
+    TENANT_DB_MAX_CONNECTIONS,
+    TENANT_DB_POOL_SIZE,
+    TENANT_DB_REPLICA_LAG_CHECK_INTERVAL,
+    TENANT_DB_REPLICA_LAG_CHECK_TIMEOUT,
+    TENANT_DB_REPLICA_MAX_LAG,
+    TENANT_DB_REPLICA_URLS,
+    TENANT_DB_STATEMENT_CACHE_SIZE,
+)
+
+ENGINE_WAIT_INTERVAL = 0.05
+
+# seconds behind the primary; 0 when every received WAL record is replayed
+# and NULL (so 0) when the server is not a standby at all
+REPLICA_LAG_SQL = """
+SELECT COALESCE(
+    CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END,
+    0
+)
+"""
+
+STATEMENT_CACHE_QUERY = {
+    "prepared_statement_cache_size": str(TENANT_DB_STATEMENT_CACHE_SIZE)
+}
+
+
+def tenant_database_url(domain: str) -> str:
+    return f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{domain}"
+
+
+def replica_key(domain: str) -> str:
+    return f"{domain}@replica"
+
+
+class TenantEngineRegistry:
+    """Process wide registry of async engines for tenant databases.
+
+    Engines are keyed by organization domain and kept in LRU order. The number of
+    engines is capped so that pool_size * engines never exceeds max_connections;
+    when the cap is reached the least recently used idle engine is disposed.
+    Engines are handed out as leases for the duration of a block and leased
+    engines are never evicted, even before they open a connection: a new tenant
+    waits up to engine_wait seconds for one to become idle and is rejected
+    otherwise.
+
+    Domains with a configured read replica get a second engine for chart reads,
+    used while the replica's lag stays within max_replica_lag seconds.
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        max_connections: int,
+        replica_urls: dict[str, str] | None = None,
+        max_replica_lag: float = TENANT_DB_REPLICA_MAX_LAG,
+        lag_check_interval: float = TENANT_DB_REPLICA_LAG_CHECK_INTERVAL,
+        lag_check_timeout: float = TENANT_DB_REPLICA_LAG_CHECK_TIMEOUT,
+        engine_wait: float = TENANT_DB_ENGINE_WAIT,
+    ):
+        self.pool_size = pool_size
+        self.max_engines = max(max_connections // pool_size, 1)
+        self.replica_urls = replica_urls or {}
+        self.max_replica_lag = max_replica_lag
+        self.lag_check_interval = lag_check_interval
+        self.lag_check_timeout = lag_check_timeout
+        self.engine_wait = engine_wait
+        self._engines: OrderedDict[str, AsyncEngine] = OrderedDict()
+        self._leases: dict[str, int] = {}
+        self._replica_lags: dict[str, tuple[float, float]] = {}
+        self._lag_probes: dict[str, asyncio.Future] = {}
+        self._lock = asyncio.Lock()
+
+    def lease(self, domain: str):
+        """Engine of the tenant's primary database, leased for an async with block."""
+        return self._lease(domain, tenant_database_url(domain))
+
+    @asynccontextmanager
+    async def read_lease(self, domain: str):
+        """Engine for chart reads: the replica unless it lags or is unreachable."""
+        replica_url = self.replica_urls.get(domain)
+        if replica_url is not None:
+            async with self._lease(replica_key(domain), replica_url) as replica:
+                if await self.replica_lag(domain, replica) <= self.max_replica_lag:
+                    yield replica
+                    return
+        async with self.lease(domain) as engine:
+            yield engine
+
+    @asynccontextmanager
+    async def _lease(self, key: str, url: str):
+        engine = await self._get_engine(key, url)
+        try:
+            yield engine
+        finally:
+            self._leases[key] -= 1
+            if not self._leases[key]:
+                del self._leases[key]
+
+    async def replica_lag(self, domain: str, replica: AsyncEngine) -> float:
+        """Replication lag in seconds, checked at most every lag_check_interval.
+
+        Concurrent reads of a domain share one in-flight probe, and a probe that
+        takes longer than lag_check_timeout counts as infinite lag, so an
+        unreachable replica sends reads to the primary instead of stalling them.
+        """
+        checked_at, lag = self._replica_lags.get(domain, (-math.inf, math.inf))
+        if time.monotonic() - checked_at < self.lag_check_interval:
+            return lag
+        probe = self._lag_probes.get(domain)
+        if probe is None:
+            probe = asyncio.ensure_future(self._probe_replica_lag(domain, replica))
+            self._lag_probes[domain] = probe
+            probe.add_done_callback(lambda _: self._lag_probes.pop(domain, None))
+        return await asyncio.shield(probe)
+
+    async def _probe_replica_lag(self, domain: str, replica: AsyncEngine) -> float:
+        try:
+            lag = await asyncio.wait_for(
+                self._query_replica_lag(replica), timeout=self.lag_check_timeout
+            )
+        except (DBAPIError, OSError, asyncio.TimeoutError):
+            lag = math.inf
+        self._replica_lags[domain] = (time.monotonic(), lag)
+        return lag
+
+    @staticmethod
+    async def _query_replica_lag(replica: AsyncEngine) -> float:
+        async with replica.connect() as connection:
+            return float((await connection.execute(text(REPLICA_LAG_SQL))).scalar())
+
+    async def _get_engine(self, key: str, url: str) -> AsyncEngine:
+        deadline = time.monotonic() + self.engine_wait
+        while True:
+            async with self._lock:
+                engine = self._engines.get(key)
+                if engine is not None:
+                    self._engines.move_to_end(key)
+                    self._leases[key] = self._leases.get(key, 0) + 1
+                    return engine
+
+                evicted = self._evict_idle()
+                if len(self._engines) < self.max_engines:
+                    engine = self._create_engine(url)
+                    self._engines[key] = engine
+                    self._leases[key] = self._leases.get(key, 0) + 1
+            # disposing waits for the pool, so it must not hold up other tenants
+            for evicted_engine in evicted:
+                await evicted_engine.dispose()
+            if engine is not None:
+                return engine
+            if time.monotonic() >= deadline:
+                raise TenantEnginesBusy()
+            await asyncio.sleep(ENGINE_WAIT_INTERVAL)
+
+    def _create_engine(self, url: str) -> AsyncEngine:
+        # asyncpg prepares every statement once per connection and reuses it
+        # for identical SQL text, up to prepared_statement_cache_size entries
+        return create_async_engine(
+            make_url(url).update_query_dict(STATEMENT_CACHE_QUERY),
+            pool_size=self.pool_size,
+            max_overflow=0,
+            pool_pre_ping=True,
+        )
+
+    def _evict_idle(self) -> list[AsyncEngine]:
+        """Remove least recently used idle engines until there is room for one more.
+
+        Leased engines and engines with checked out connections stay registered,
+        so their connections keep counting towards max_connections.
+        """
+        evicted = []
+        while len(self._engines) >= self.max_engines:
+            idle_key = next(
+                (
+                    key
+                    for key, engine in self._engines.items()
+                    if not self._leases.get(key) and engine.pool.checkedout() == 0
+                ),
+                None,
+            )
+            if idle_key is None:
+                break
+            evicted.append(self._engines.pop(idle_key))
+        return evicted
+
+    async def dispose(self, domain: str):
+        async with self._lock:
+            self._replica_lags.pop(domain, None)
+            engines = [
+                self._engines.pop(key, None) for key in (domain, replica_key(domain))
+            ]
+        for engine in engines:
+            if engine is not None:
+                await engine.dispose()
+
+    async def dispose_all(self):
+        async with self._lock:
+            while self._engines:
+                _, engine = self._engines.popitem(last=False)
+                await engine.dispose()
+
+
+tenant_engines = TenantEngineRegistry(
+    pool_size=TENANT_DB_POOL_SIZE,
+    max_connections=TENANT_DB_MAX_CONNECTIONS,
+    replica_urls=TENANT_DB_REPLICA_URLS,
+)
@@ -0,0 +1,82 @@
+from app.helpers import messages
+from app.helpers.exceptions import ValidationError
+from app.routers.admin.schemas.credentials import (
+    ChartAggregate,
+    ChartGranularity,
+    ChartType,
+)
+
+BUCKETED_CHART_TYPES = [
+    ChartType.single_line.value,
+    ChartType.multi_line.value,
+    ChartType.area.value,
+    ChartType.composed.value,
+    ChartType.horizontal_bar.value,
+    ChartType.vertical_bar.value,
+]
+
+
+def quote_column(column: str) -> str:
+    if '"' in column:
+        raise ValidationError(messages.INVALID_KEYSET_COLUMN)
+    return f'chart_bucket."{column}"'
+
+
+def bucket_sql(
+    sql: str,
+    x_column: str,
+    y_column: str,
+    granularity: str,
+    aggregate: str = ChartAggregate.sum.value,
+    group_columns: tuple[str, ...] = (),
+    latest_columns: tuple[str, ...] = (),
+) -> str:
+    """Wrap chart SQL so Postgres returns one row per time bucket.
+
+    The x column is truncated with date_trunc and the y column aggregated;
+    ``group_columns`` (e.g. the series of a grouped multi-line chart) stay in
+    the GROUP BY and ``latest_columns`` (e.g. a separate watermark) keep their
+    max value per bucket. Output columns keep their original names so the
+    generators read bucketed rows like raw ones.
+    """
+    granularity = ChartGranularity(granularity).value
+    aggregate = ChartAggregate(aggregate).value
+    columns = [
+        f"date_trunc('{granularity}', {quote_column(x_column)}) AS \"{x_column}\"",
+        f'{aggregate}({quote_column(y_column)}) AS "{y_column}"',
+        *(f'{quote_column(column)} AS "{column}"' for column in group_columns),
+        *(f'max({quote_column(column)}) AS "{column}"' for column in latest_columns),
+    ]
+    group_by = ", ".join(
+        ["1", *(str(index + 3) for index in range(len(group_columns)))]
+    )
+    return (
+        f"SELECT {', '.join(columns)} "
+        f"FROM ({sql.strip().rstrip(';')}) AS chart_bucket "
+        f"GROUP BY {group_by} ORDER BY 1"
+    )
+
+
+def chart_bucket_sql(chart_config, sql: str) -> str:
+    granularity = chart_config.get("granularity")
+    if not granularity or chart_config["type"] not in BUCKETED_CHART_TYPES:
+        return sql
+    metrics = chart_config["metrics"]
+    bucket_columns = {metrics["x-axis"], metrics["y-axis"]}
+    group_columns = tuple(
+        column for column in (metrics.get("series"),) if column is not None
+    )
+    latest_columns = tuple(
+        column
+        for column in (chart_config.get("watermark_column"),)
+        if column is not None and column not in (*bucket_columns, *group_columns)
+    )
+    return bucket_sql(
+        sql,
+        metrics["x-axis"],
+        metrics["y-axis"],
+        granularity,
+        chart_config.get("aggregate", ChartAggregate.sum.value),
+        group_columns,
+        latest_columns,
+    )
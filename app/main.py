@@ -9,12 +9,14 @@ from starlette.status import (
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
+from .helpers.data_events import data_change_broadcaster
 from .helpers.exceptions import (
     MethodNotAllowed,
     NotFound,
     ServiceException,
     ValidationError,
 )
+from .helpers.tenant_engines import tenant_engines
 from .routers.admin import admin
 from .routers.auth import auth
 from .routers.dashboard import dashboard
@@ -28,6 +30,16 @@ app.include_router(admin.router, prefix="/api/v1")
 app.include_router(dashboard.router, prefix="/api/v1")
 
 
+@app.on_event("shutdown")
+async def dispose_tenant_engines():
+    await tenant_engines.dispose_all()
+
+
+@app.on_event("shutdown")
+async def close_data_change_broadcaster():
+    await data_change_broadcaster.close()
+
+
 @app.exception_handler(HTTP_404_NOT_FOUND)
 async def not_found_handler(request: Request, exc: NotFound):
     return NotFound().to_response()
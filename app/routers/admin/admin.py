@@ -8,11 +8,11 @@ from botocore.exceptions import ClientError
 from fastapi import APIRouter, Depends, File, Query, UploadFile, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
-from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from starlette.requests import Request
 
 from app.helpers import messages, vault
+from app.helpers.chart_plans import validate_chart_configs
 from app.helpers.database import get_db
 from app.helpers.dbt_runner import update_dbt_configs, update_dbt_models
 from app.helpers.download_folder import download_folder_zip
@@ -24,8 +24,11 @@ from app.helpers.exceptions import (
 )
 from app.helpers.jwt import create_access_token
 from app.helpers.mail import send_mail
+from app.helpers.materialized_views import create_chart_materialized_views
 from app.helpers.middlewares import is_admin_middleware, is_super_user_middleware
 from app.helpers.minio import add_file_to_minio, sync_configs_minio_local
+from app.helpers.query_plans import analyze_chart_queries, chart_plan_report
+from app.helpers.query_scheduler import query_scheduler
 from app.helpers.response import Response
 from app.routers.admin.crud import (
     company_domain_exists_in_db,
@@ -35,13 +38,16 @@ from app.routers.admin.crud import (
     save_chart_data_in_db,
 )
 from app.routers.admin.schemas.credentials import (
-    ChartConfigSchema,
     DashboardSchema,
     EnvironmentVariableSchema,
 )
 from app.routers.admin.schemas.dbt_schemas import DBTConfigSchema
 from app.routers.admin.schemas.schema import AdminUserSchema
-from app.routers.admin.tasks import dbt_run_task, meltano_run_task
+from app.routers.admin.tasks import (
+    dbt_run_task,
+    meltano_run_task,
+    precompute_chart_snapshots_task,
+)
 from app.routers.admin.utils import (
     create_chart_yaml,
     create_meltano_config,
@@ -141,24 +147,33 @@ async def update_or_create_dashboard_and_chart(
     organization = get_domain(domain, db)
     if organization is None:
         raise ValidationError(messages.COMPANY_NOT_FOUND)
+    validate_chart_configs(chart_content.charts)
+    analyzed_chart_data = await analyze_chart_queries(domain, chart_content.charts)
     dashboard_id = create_dashboard(
         chart_content.name,
         organization.id,
         admin_info.user_id,
         chart_content.dashboard_unique_identifier,
         db,
+        query_timeout=chart_content.timeout,
     )
     file_name = files.filename
     create_chart_yaml(yaml_content, domain, file_name)
 
-    chart_data = chart_content.charts
+    chart_data = analyzed_chart_data
     try:
-        chart_data = TypeAdapter(ChartConfigSchema).validate_python(chart_data)
+        chart_data = await create_chart_materialized_views(
+            domain, dashboard_id, chart_data
+        )
         save_chart_data_in_db(chart_data, dashboard_id, admin_info.user_id, db)
     except ValidationError as e:
         raise ValidationError()
 
-    return Response(message=messages.SUCCESS, code=status.HTTP_200_OK)
+    return Response(
+        data=chart_plan_report(chart_data),
+        message=messages.SUCCESS,
+        code=status.HTTP_200_OK,
+    )
 
 
 @router.post("/dashboard-add-chart")
@@ -176,12 +191,15 @@ async def dashboard_add_chart(
     organization = get_domain(domain, db)
     if organization is None:
         raise ValidationError(messages.COMPANY_NOT_FOUND)
+    validate_chart_configs(chart_content["charts"])
+    analyzed_chart_data = await analyze_chart_queries(domain, chart_content["charts"])
     dashboard_id = create_dashboard(
         chart_content["name"],
         organization.id,
         admin_info.user_id,
         chart_content["dashboard_unique_identifier"],
         db,
+        query_timeout=chart_content.get("timeout"),
     )
 
     organization_owner = get_organization_owner(db, organization.id)
@@ -194,13 +212,20 @@ async def dashboard_add_chart(
     file_name = files.filename
     create_chart_yaml(yaml_content, domain, file_name)
 
-    chart_data = chart_content["charts"]
+    chart_data = analyzed_chart_data
     try:
+        chart_data = await create_chart_materialized_views(
+            domain, dashboard_id, chart_data
+        )
         save_chart_data_in_db(chart_data, dashboard_id, admin_info.user_id, db)
     except ValidationError as e:
         raise ValidationError()
 
-    return Response(message=messages.SUCCESS, code=status.HTTP_200_OK)
+    return Response(
+        data=chart_plan_report(chart_data),
+        message=messages.SUCCESS,
+        code=status.HTTP_200_OK,
+    )
 
 
 @router.post("/run-meltano")
@@ -219,7 +244,8 @@ async def run_meltano(
     create_meltano_config(yaml_content, meltano_config_file.filename)
     add_file_to_minio(data=meltano_config_file, domain=domain, folder_type="configs")
     meltano_run_task.apply_async(
-        kwargs={"yaml_content": meltano_config_data, "domain": domain}
+        kwargs={"yaml_content": meltano_config_data, "domain": domain},
+        link=precompute_chart_snapshots_task.si(domain),
     )
 
     return Response(message=messages.SUCCESS, code=status.HTTP_200_OK)
@@ -262,11 +288,23 @@ async def run_dbt(
                     messages="Meltano extracting and loading processes are running for same domain"
                 )
 
-    dbt_run_task.apply_async(kwargs={"domain": domain, "sql_names": sql_names})
+    dbt_run_task.apply_async(
+        kwargs={"domain": domain, "sql_names": sql_names},
+        link=precompute_chart_snapshots_task.si(domain),
+    )
 
     return Response(message=messages.SUCCESS, code=status.HTTP_200_OK)
 
 
+@router.get("/query-scheduler")
+async def query_scheduler_stats(
+    admin_info: UserTokenPayload = Depends(is_admin_middleware()),
+):
+    return Response(
+        data=query_scheduler.stats(), message=messages.SUCCESS, code=status.HTTP_200_OK
+    )
+
+
 @router.get("/download-folder/{domain}")
 async def download_folder(
     domain: str,
@@ -4,6 +4,13 @@ from sqlalchemy import delete, insert, select, update
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
+from app.helpers.chart_plans import (
+    chart_plans,
+    chart_version,
+    compile_chart_plan,
+    is_sql_chart,
+    validate_chart_configs,
+)
 from app.routers.admin.schemas.credentials import ChartConfigSchema
 from app.routers.admin.schemas.schema import AdminUserSchema
 from app.routers.auth.crud import insert_data
@@ -30,6 +37,7 @@ def get_active_admin_by_email(
 def save_chart_data_in_db(
     chart_data: List[Dict], dashboard_id: int, consultant_id: int, db: Session
 ) -> List[Chart] | None:
+    validate_chart_configs(chart_data)
     existing_chart_models = (
         db.query(Chart)
         .filter(
@@ -49,6 +57,7 @@ def save_chart_data_in_db(
         ):
             db.delete(chart_model)
 
+    chart_models = []
     for config in chart_data:
         chart_model = (
             db.query(Chart)
@@ -76,8 +85,19 @@ def save_chart_data_in_db(
             )
 
             db.add(chart_model)
+        chart_models.append(chart_model)
 
     db.commit()
+    # compiled once here, so views of the new version only execute the plan
+    for chart_model in chart_models:
+        if not is_sql_chart(chart_model.config):
+            continue
+        chart_plans.put(
+            compile_chart_plan(
+                {**chart_model.config, "chart_id": chart_model.id},
+                chart_version(chart_model),
+            )
+        )
     return chart_data
 
 
@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import Annotated, List, Literal, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class AvailableCredentials(str, Enum):
@@ -62,97 +62,230 @@ class ChartType(str, Enum):
     radar_bar = "radar_bar"
 
 
+class ChartValueFormat(str, Enum):
+    native = "native"
+    string = "string"
+
+
+class ChartGranularity(str, Enum):
+    minute = "minute"
+    hour = "hour"
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+class ChartAggregate(str, Enum):
+    sum = "sum"
+    avg = "avg"
+    min = "min"
+    max = "max"
+    count = "count"
+
+
+class ChartSampleMethod(str, Enum):
+    system = "system"
+    bernoulli = "bernoulli"
+
+
+class ChartSampleSchema(BaseModel):
+    # defaults to the chart's source_table
+    table: str | None = None
+    percent: float = Field(gt=0, le=100)
+    method: ChartSampleMethod = ChartSampleMethod.system
+    seed: int | None = None
+    # set when the chart's value is a count or sum, to estimate the full table
+    scale: bool = False
+
+
+class ChartSourceSchema(BaseModel):
+    # legacy charts are built from source_table, the others run their own sql
+    source_table: str | None = None
+    sql: str | None = None
+
+    def has_source(self) -> bool:
+        return bool(self.sql or self.source_table)
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if not self.has_source():
+            raise ValueError("sql or source_table is required")
+        return self
+
+
 class SingleLineMetricsSchema(BaseModel):
-    x_axis: str
-    y_axis: str
+    model_config = ConfigDict(populate_by_name=True)
+
+    x_axis: str = Field(alias="x-axis")
+    y_axis: str = Field(alias="y-axis")
 
 
-class ChartSingleLineSchema(BaseModel):
+class ChartSingleLineSchema(ChartSourceSchema):
     name: str
     dashboard_chart_unique_identifier: str
-    source_table: str
     type: Literal[ChartType.single_line]
     metrics: SingleLineMetricsSchema
+    max_points: int | None = Field(default=None, ge=3)
+    materialize: bool = False
+    format: ChartValueFormat = ChartValueFormat.native
+    timeout: float | None = Field(default=None, gt=0)
+    granularity: ChartGranularity | None = None
+    # the x-axis is a timestamp, so ?granularity= can bucket it per request
+    temporal: bool = False
+    aggregate: ChartAggregate = ChartAggregate.sum
+    watermark_column: str | None = None
 
 
 class MultiLineMetricsSchema(BaseModel):
-    x_axis: str
-    y_axis: str
-    group_by: str
+    model_config = ConfigDict(populate_by_name=True)
+
+    x_axis: str = Field(alias="x-axis")
+    y_axis: str = Field(alias="y-axis")
+    group_by: str | None = None
+    series: str | None = None
+
+
+class ChartLineSchema(BaseModel):
+    name: str
+    sql: str
 
 
-class ChartMultiLineSchema(BaseModel):
+class ChartMultiLineSchema(ChartSourceSchema):
     name: str
     dashboard_chart_unique_identifier: str
-    source_table: str
-    type: Literal[ChartType.multi_line]
+    type: Literal[
+        ChartType.multi_line,
+        ChartType.area,
+        ChartType.composed,
+        ChartType.radar,
+        ChartType.radar_bar,
+    ]
     metrics: MultiLineMetricsSchema
+    lines: list[ChartLineSchema] | None = None
+    max_points: int | None = Field(default=None, ge=3)
+    materialize: bool = False
+    format: ChartValueFormat = ChartValueFormat.native
+    timeout: float | None = Field(default=None, gt=0)
+    granularity: ChartGranularity | None = None
+    # the x-axis is a timestamp, so ?granularity= can bucket it per request
+    temporal: bool = False
+    aggregate: ChartAggregate = ChartAggregate.sum
+    watermark_column: str | None = None
+
+    def has_source(self) -> bool:
+        return super().has_source() or bool(self.lines)
+
+    @model_validator(mode="after")
+    def check_series(self):
+        # a single query returns every line, told apart by the series column
+        if self.sql and not self.lines and not self.metrics.series:
+            raise ValueError("metrics.series or lines is required with sql")
+        return self
+
+
+class ChartPieSchema(ChartSourceSchema):
+    label_field: str | None = None
+
+    @model_validator(mode="after")
+    def check_label_field(self):
+        if self.sql and not self.label_field:
+            raise ValueError("label_field is required with sql")
+        return self
 
 
 class PieNoCenterMetricsSchema(BaseModel):
     column: str
 
 
-class ChartPieNoCenterSchema(BaseModel):
+class ChartPieNoCenterSchema(ChartPieSchema):
     name: str
     dashboard_chart_unique_identifier: str
-    sql: str
     type: Literal[ChartType.pie_no_center]
     metrics: PieNoCenterMetricsSchema
+    materialize: bool = False
+    format: ChartValueFormat = ChartValueFormat.native
+    timeout: float | None = Field(default=None, gt=0)
+    sample: ChartSampleSchema | None = None
 
 
 class PieWithCenterMetricsSchema(BaseModel):
     column: str
 
 
-class ChartPieWithCenterSchema(BaseModel):
+class ChartPieWithCenterSchema(ChartPieSchema):
     name: str
     dashboard_chart_unique_identifier: str
-    source_table: str
     type: Literal[ChartType.pie_with_center]
     metrics: PieWithCenterMetricsSchema
+    materialize: bool = False
+    format: ChartValueFormat = ChartValueFormat.native
+    timeout: float | None = Field(default=None, gt=0)
+    sample: ChartSampleSchema | None = None
 
 
 class HorizontalBarMetricsSchema(BaseModel):
-    x_axis: str
-    y_axis: str
-    group_by: str
+    model_config = ConfigDict(populate_by_name=True)
 
+    x_axis: str = Field(alias="x-axis")
+    y_axis: str = Field(alias="y-axis")
+    group_by: str | None = None
 
-class ChartHorizontalBarSchema(BaseModel):
+
+class ChartHorizontalBarSchema(ChartSourceSchema):
     name: str
     dashboard_chart_unique_identifier: str
-    source_table: str
     type: Literal[ChartType.horizontal_bar]
     metrics: HorizontalBarMetricsSchema
+    materialize: bool = False
+    format: ChartValueFormat = ChartValueFormat.native
+    timeout: float | None = Field(default=None, gt=0)
+    sample: ChartSampleSchema | None = None
+    granularity: ChartGranularity | None = None
+    # the x-axis is a timestamp, so ?granularity= can bucket it per request
+    temporal: bool = False
+    aggregate: ChartAggregate = ChartAggregate.sum
 
 
 class VerticalBarMetricsSchema(BaseModel):
-    x_axis: str
-    y_axis: str
-    group_by: str
+    model_config = ConfigDict(populate_by_name=True)
+
+    x_axis: str = Field(alias="x-axis")
+    y_axis: str = Field(alias="y-axis")
+    group_by: str | None = None
 
 
-class ChartVerticalBarSchema(BaseModel):
+class ChartVerticalBarSchema(ChartSourceSchema):
     name: str
     dashboard_chart_unique_identifier: str
-    source_table: str
     type: Literal[ChartType.vertical_bar]
     metrics: VerticalBarMetricsSchema
+    materialize: bool = False
+    format: ChartValueFormat = ChartValueFormat.native
+    timeout: float | None = Field(default=None, gt=0)
+    sample: ChartSampleSchema | None = None
+    granularity: ChartGranularity | None = None
+    # the x-axis is a timestamp, so ?granularity= can bucket it per request
+    temporal: bool = False
+    aggregate: ChartAggregate = ChartAggregate.sum
 
 
 class ScatterMetricsSchema(BaseModel):
-    x_axis: str
-    y_axis: str
-    group_by: str
+    model_config = ConfigDict(populate_by_name=True)
+
+    x_axis: str = Field(alias="x-axis")
+    y_axis: str = Field(alias="y-axis")
+    group_by: str | None = None
 
 
-class ChartScatterSchema(BaseModel):
+class ChartScatterSchema(ChartSourceSchema):
     name: str
     dashboard_chart_unique_identifier: str
-    source_table: str
     type: Literal[ChartType.scatter]
     metrics: ScatterMetricsSchema
+    materialize: bool = False
+    format: ChartValueFormat = ChartValueFormat.native
+    timeout: float | None = Field(default=None, gt=0)
+    watermark_column: str | None = None
 
 
 ChartConfigSchema = list[
@@ -175,4 +308,5 @@ class DashboardSchema(BaseModel):
     name: str
     domain: str
     dashboard_unique_identifier: str
+    timeout: float | None = Field(default=None, gt=0)
     charts: List
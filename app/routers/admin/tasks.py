@@ -1,7 +1,18 @@
+import asyncio
+
+from app.helpers.chart_cache import get_data_version, invalidate_domain
+from app.helpers.data_events import publish_data_changed
+from app.helpers.database import SessionLocal
 from app.helpers.dbt_runner import run_custom_dbt
+from app.helpers.materialized_views import refresh_materialized_views
 from app.helpers.meltano_factory import meltano_factory
 from app.helpers.minio import sync_configs_minio_local
 from app.helpers.slack_insights import send_slack_notification
+from app.routers.dashboard.crud import (
+    get_domain_charts_config_data,
+    precompute_charts_data,
+    save_chart_snapshots,
+)
 from app.worker import BaseCeleryTask, celery_app
 
 
@@ -10,6 +21,8 @@ def meltano_run_task(domain, yaml_content):
     try:
         sync_configs_minio_local(domain)
         meltano_factory(yaml_content, domain)
+        refresh_materialized_views(domain)
+        invalidate_domain(domain)
         send_slack_notification(
             "EL process has been run successfully for domain: " + domain
         )
@@ -25,9 +38,26 @@ def dbt_run_task(domain, sql_names):
     try:
         sync_configs_minio_local(domain)
         run_custom_dbt(domain, sql_names)
+        refresh_materialized_views(domain)
+        invalidate_domain(domain)
         send_slack_notification(
             "Transformation has been run successfully for domain: " + domain
         )
     except Exception as e:
         send_slack_notification("Error occurred during DBT run for domain: " + domain)
         raise e
+
+
+@celery_app.task(name="precompute_chart_snapshots", base=BaseCeleryTask)
+def precompute_chart_snapshots_task(domain):
+    data_version = get_data_version(domain)
+    try:
+        with SessionLocal() as db:
+            chart_configs = get_domain_charts_config_data(domain, db)
+            if not chart_configs:
+                return
+            charts_data = asyncio.run(precompute_charts_data(domain, chart_configs))
+            save_chart_snapshots(chart_configs, charts_data, data_version, db)
+    finally:
+        # announced once snapshots are in place, so clients re-fetch cheaply
+        publish_data_changed(domain, data_version)
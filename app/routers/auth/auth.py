@@ -1,5 +1,4 @@
 from fastapi import APIRouter, Depends, Request, status
-from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app.helpers import messages
@@ -186,9 +185,11 @@ async def check_user_by_auth_code(
 @router.get("/countries")
 async def country(db: Session = Depends(get_db)):
     country_list = get_country(db)
-    countries = CountryListSchema(data=jsonable_encoder(country_list)).model_dump()
+    countries = CountryListSchema.model_validate(
+        {"data": country_list}, from_attributes=True
+    )
     return Response(
-        data=countries["data"], message=messages.SUCCESS, code=status.HTTP_200_OK
+        data=countries.data, message=messages.SUCCESS, code=status.HTTP_200_OK
     )
 
 
@@ -1,17 +1,48 @@
+import asyncio
+import hashlib
+import json
+import re
 from datetime import datetime
 from typing import List, Type, Union
 
+import orjson
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.dialects.postgresql.asyncpg import AsyncAdapt_asyncpg_dbapi
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import text
 
-from app.helpers.chart_data_factory import ChartGeneratorFactory
-
-from ...settings import DB_HOST, DB_PASSWORD, DB_PORT, DB_USER
+from app.helpers import messages
+from app.helpers.chart_cache import chart_cache, config_hash
+from app.helpers.chart_columns import get_column
+from app.helpers.chart_plans import (
+    ChartPlan,
+    ChartStatement,
+    chart_plans,
+    chart_version,
+    is_multi_query_chart,
+)
+from app.helpers.exceptions import QueryQueueFull
+from app.helpers.pagination import (
+    chart_keyset_column,
+    chart_keyset_tiebreaker,
+    encode_cursor,
+    paginate_sql,
+)
+from app.helpers.query_scheduler import TenantQuerySlots, query_scheduler
+from app.helpers.response import json_default
+from app.helpers.sampling import chart_sample, sample_rate, tablesample_clause
+from app.helpers.tenant_engines import tenant_engines
+from app.helpers.time_buckets import chart_bucket_sql
+
+from ...settings import (
+    CHART_QUERY_CONCURRENCY,
+    CHART_QUERY_TIMEOUT,
+    DASHBOARD_QUERY_TIMEOUT,
+)
 from ..admin.schemas.credentials import ChartType
 from ..organization.models import Organization
-from .models import Chart, Dashboard, UserDashboard
+from .models import Chart, ChartSnapshot, Dashboard, UserDashboard
 from .schema import SortBy, UserInfoSchema
 
 
@@ -183,17 +214,20 @@ def create_dashboard(
     consultant_id: int,
     dashboard_unique_identifier: str,
     db: Session,
+    query_timeout: float | None = None,
 ) -> Dashboard | None:
     _insert = insert(Dashboard).values(
         name=name,
         organization_id=organization_id,
         consultant_id=consultant_id,
         dashboard_unique_identifier=dashboard_unique_identifier,
+        query_timeout=query_timeout,
     )
     _query = _insert.on_conflict_do_update(
         index_elements=["dashboard_unique_identifier"],
         set_={
             "name": name,
+            "query_timeout": query_timeout,
         },
     ).returning(Dashboard.id)
     dashboard_id = db.execute(_query).scalar()
@@ -205,6 +239,100 @@ def get_charts_config(dashboard_id: int, db: Session):
     return db.query(Chart).filter_by(dashboard_id=dashboard_id).all()
 
 
+def get_chart_by_id(dashboard_id: int, chart_id: int, db: Session) -> Chart | None:
+    return db.query(Chart).filter_by(id=chart_id, dashboard_id=dashboard_id).first()
+
+
+def chart_config_data(chart: Chart) -> dict:
+    return {
+        **chart.config,
+        "chart_id": chart.id,
+        "chart_version": chart_version(chart),
+    }
+
+
+def get_charts_config_data(dashboard_id: int, db: Session) -> list[dict]:
+    return [chart_config_data(chart) for chart in get_charts_config(dashboard_id, db)]
+
+
+def get_domain_charts_config_data(domain: str, db: Session) -> list[dict]:
+    charts = (
+        db.query(Chart)
+        .join(Dashboard)
+        .join(Organization)
+        .filter(Organization.domain == domain, Dashboard.deleted.is_(False))
+        .all()
+    )
+    return [chart_config_data(chart) for chart in charts]
+
+
+def get_fresh_chart_snapshots(
+    chart_configs: list[dict], data_version: int, db: Session
+) -> dict[int, dict]:
+    """Return snapshot payloads by chart id for snapshots that are still valid.
+
+    A snapshot is fresh when it was computed for the current data version and
+    from the chart's current config.
+    """
+    config_hashes = {
+        chart_config["chart_id"]: config_hash(chart_config)
+        for chart_config in chart_configs
+    }
+    snapshots = (
+        db.query(ChartSnapshot)
+        .filter(
+            ChartSnapshot.chart_id.in_(config_hashes),
+            ChartSnapshot.data_version == data_version,
+        )
+        .all()
+    )
+    return {
+        snapshot.chart_id: snapshot.data
+        for snapshot in snapshots
+        if snapshot.config_hash == config_hashes[snapshot.chart_id]
+    }
+
+
+def save_chart_snapshots(
+    chart_configs: list[dict], charts_data: list, data_version: int, db: Session
+) -> None:
+    for chart_config, data in zip(chart_configs, charts_data):
+        if data is None:
+            continue
+        values = {
+            "data_version": data_version,
+            "config_hash": config_hash(chart_config),
+            "data": orjson.loads(orjson.dumps(data, default=json_default)),
+            "updated_at": datetime.utcnow(),
+        }
+        _insert = insert(ChartSnapshot).values(
+            chart_id=chart_config["chart_id"], **values
+        )
+        db.execute(
+            _insert.on_conflict_do_update(index_elements=["chart_id"], set_=values)
+        )
+    db.commit()
+
+
+def with_granularity(chart_configs: list[dict], granularity) -> list[dict]:
+    """Override the time bucket for a single request.
+
+    Only charts with a temporal x-axis, marked by ``temporal: true`` or a
+    configured granularity, are bucketed; categorical charts are left as they
+    are, since date_trunc fails on their x column.
+    """
+    if not granularity:
+        return chart_configs
+    return [
+        (
+            {**chart_config, "granularity": granularity}
+            if chart_config.get("temporal") or chart_config.get("granularity")
+            else chart_config
+        )
+        for chart_config in chart_configs
+    ]
+
+
 def get_domain_by_dashboard_id(dashboard_id: int, db: Session):
     return (
         db.query(Organization).join(Dashboard).filter_by(id=dashboard_id).first().domain
@@ -245,62 +373,372 @@ def column_tuple_creator(sql_type: ChartType, **kwargs):
 
 
 async def get_charts_from_db(db_name, sql_list_chart_config):
-    DATABASE_URL = (
-        f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{db_name}"
-    )
-    engine = create_async_engine(DATABASE_URL, pool_size=10, max_overflow=0)
     sql_query_list = []
-    async with engine.connect() as connection:
-        for chart_config in sql_list_chart_config:
-            column = column_tuple_creator(
-                chart_config["type"], **chart_config["metrics"]
-            )
-            sql_query = text(
-                chart_config["sql_string"].format(
-                    column=column, source_table=chart_config["source_table"]
+    async with tenant_engines.read_lease(db_name) as engine:
+        async with engine.connect() as connection:
+            for chart_config in sql_list_chart_config:
+                column = column_tuple_creator(
+                    chart_config["type"], **chart_config["metrics"]
                 )
-            )
-            result = await connection.execute(sql_query)
-            result = result.fetchall()
-            sql_query_list.append(
-                {
+                sample = chart_sample(chart_config)
+                sql_query = text(
+                    chart_config["sql_string"].format(
+                        column=column,
+                        source_table=chart_config["source_table"],
+                        sample=tablesample_clause(sample) if sample else "",
+                    )
+                )
+                result = await connection.execute(sql_query)
+                result = result.fetchall()
+                chart_data = {
                     "type": chart_config["type"],
                     "data": [query_result._asdict() for query_result in result],
+                    "approximate": sample is not None,
                 }
-            )
+                if sample is not None:
+                    chart_data["sample_rate"] = sample_rate(sample)
+                sql_query_list.append(chart_data)
     return sql_query_list
 
 
-async def get_charts_data(db_name, sql_list_chart_config):
-    DATABASE_URL = (
-        f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{db_name}"
+QUERY_CANCELED_SQLSTATE = "57014"
+STATEMENT_IDENTITY_PATTERN = re.compile(r"^\s*/\* chart .*? \*/ ")
+SQL_WHITESPACE_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+STATEMENT_TIMEOUT_SQL = "SELECT set_config('statement_timeout', :timeout, true)"
+
+
+def chart_query(chart_config, sql: str) -> tuple[str, dict]:
+    if chart_config.get("since"):
+        # the row at the watermark is sent again: on bucketed or aggregated
+        # charts it is the newest bucket, which keeps growing after the cursor
+        return paginate_sql(
+            sql,
+            chart_config["watermark_column"],
+            after=chart_config["since"],
+            inclusive=True,
+        )
+    page = chart_config.get("page")
+    if not page:
+        return sql, {}
+    return paginate_sql(
+        sql,
+        chart_keyset_column(chart_config),
+        tiebreaker_column=chart_keyset_tiebreaker(chart_config),
+        **page,
     )
-    engine = create_async_engine(DATABASE_URL, pool_size=10, max_overflow=0)
-    sql_query_list = []
+
+
+def chart_statement(chart_config, statement: ChartStatement) -> tuple[str, dict]:
+    sql, params = chart_query(
+        chart_config, chart_bucket_sql(chart_config, statement.sql)
+    )
+    return statement.identity + sql, params
+
+
+def next_page_cursor(chart_config, result) -> str | None:
+    limit = chart_config["page"].get("limit")
+    tiebreaker_column = chart_keyset_tiebreaker(chart_config)
+    if not limit or not tiebreaker_column:
+        return None
+    key_column = chart_keyset_column(chart_config)
+    querysets = result if is_multi_query_chart(chart_config) else [result]
+    # the smallest last position among full pages, so that no series skips rows
+    last_keys = [
+        (queryset[-1]._mapping[key_column], queryset[-1]._mapping[tiebreaker_column])
+        for queryset in querysets
+        if len(queryset) == limit
+    ]
+    return encode_cursor(min(last_keys)) if last_keys else None
+
+
+def watermark_cursor(chart_config, result) -> str | None:
+    """Cursor at the newest watermark value, for the next incremental refresh.
+
+    The next refresh sends the rows at this watermark again, so clients replace
+    points that share an x value instead of appending them. Falls back to the
+    requested ``since`` cursor when there are no new rows.
+    """
+    watermark_column = chart_config["watermark_column"]
+    querysets = result if is_multi_query_chart(chart_config) else [result]
+    watermarks = [
+        watermark
+        for queryset in querysets
+        for watermark in get_column(queryset, watermark_column)
+        if watermark is not None
+    ]
+    if not watermarks:
+        return chart_config.get("since")
+    return encode_cursor(max(watermarks))
+
+
+def chart_error(chart_config, code: str, message: str) -> dict:
+    return {
+        "size": 1,
+        "type": chart_config["type"],
+        "data": [],
+        "metrics": chart_config.get("metrics"),
+        "error": {"code": code, "message": message},
+    }
+
+
+def is_query_canceled(error: DBAPIError) -> bool:
+    return getattr(error.orig, "sqlstate", None) == QUERY_CANCELED_SQLSTATE
+
+
+async def execute_rows(engine, sql: str, params: dict, timeout: float):
     async with engine.connect() as connection:
-        for chart_config in sql_list_chart_config:
-            if chart_config["type"] in[ChartType.multi_line.value,
-                                       ChartType.radar.value,
-                                       ChartType.radar_bar.value,
-                                       ChartType.composed.value,
-                                       ChartType.area.value,
-                                    ]:
-                result = []
-                for line in chart_config["lines"]:
-                    sql_query = text(line["sql"])
-                    line_data = await connection.execute(sql_query)
-                    line_data = line_data.fetchall()
-                    result.append(line_data)
-            else:
-                sql_query = text(chart_config["sql"])
-                result = await connection.execute(sql_query)
-                result = result.fetchall()
+        await connection.execute(
+            text(STATEMENT_TIMEOUT_SQL),
+            {"timeout": f"{max(int(timeout * 1000), 1)}ms"},
+        )
+        result = await connection.execute(text(sql), params)
+        return result.fetchall()
+
+
+async def fetch_rows(
+    engine,
+    semaphore: TenantQuerySlots,
+    sql: str,
+    params: dict | None = None,
+    timeout: float = CHART_QUERY_TIMEOUT,
+    deadline: float | None = None,
+):
+    async with semaphore:
+        # the statement timeout never outlives the dashboard's remaining budget
+        if deadline is not None:
+            timeout = min(timeout, deadline - asyncio.get_running_loop().time())
+        if timeout <= 0:
+            raise asyncio.TimeoutError()
+        try:
+            return await execute_rows(engine, sql, params or {}, timeout)
+        except DBAPIError as error:
+            if not isinstance(
+                error.orig, AsyncAdapt_asyncpg_dbapi.InvalidCachedStatementError
+            ):
+                raise
+            # e.g. a materialized view was recreated; the dialect has purged its
+            # statement cache, so preparing again succeeds
+            return await execute_rows(engine, sql, params or {}, timeout)
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL without the statement identity comment and insignificant whitespace."""
+    sql = STATEMENT_IDENTITY_PATTERN.sub("", sql, count=1)
+    # quoted literals and identifiers are kept verbatim
+    sql = SQL_WHITESPACE_PATTERN.sub(lambda match: match.group(1) or " ", sql)
+    return sql.strip().rstrip(";").strip()
+
+
+def query_key(sql: str, params: dict | None, timeout: float | None = None) -> str:
+    serialized = json.dumps(
+        [normalize_sql(sql), params or {}, timeout], sort_keys=True, default=str
+    )
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+async def fetch_shared_rows(
+    engine,
+    semaphore: TenantQuerySlots,
+    sql: str,
+    params: dict | None = None,
+    timeout: float = CHART_QUERY_TIMEOUT,
+    deadline: float | None = None,
+    shared_queries: dict | None = None,
+):
+    """fetch_rows that runs each distinct query once per dashboard load.
+
+    Charts (and lines of multi-line charts) that normalize to the same SQL and
+    parameters await the same task, so the rows are fetched once and fanned
+    out to every generator. The task is shielded so that one chart running
+    out of time does not cancel the query for the others. The timeout is part
+    of the key, so every chart keeps its own statement timeout.
+    """
+    if shared_queries is None:
+        return await fetch_rows(engine, semaphore, sql, params, timeout, deadline)
+    key = query_key(sql, params, timeout)
+    if key not in shared_queries:
+        shared_queries[key] = asyncio.ensure_future(
+            fetch_rows(engine, semaphore, sql, params, timeout, deadline)
+        )
+    return await asyncio.shield(shared_queries[key])
+
+
+async def fetch_chart_rows(
+    engine,
+    semaphore: TenantQuerySlots,
+    chart_config,
+    plan: ChartPlan,
+    deadline: float | None = None,
+    shared_queries: dict | None = None,
+):
+    timeout = chart_config.get("timeout") or CHART_QUERY_TIMEOUT
+    result = await asyncio.gather(
+        *(
+            fetch_shared_rows(
+                engine,
+                semaphore,
+                *chart_statement(chart_config, statement),
+                timeout=timeout,
+                deadline=deadline,
+                shared_queries=shared_queries,
+            )
+            for statement in plan.statements
+        )
+    )
+    return list(result) if plan.multi_query else result[0]
+
+
+def cancel_shared_queries(shared_queries: dict) -> None:
+    for task in shared_queries.values():
+        task.cancel()
 
-            generator = ChartGeneratorFactory.get_chart_data(chart_config["type"])
-            data = generator.generate_data(chart_config, result)
-            sql_query_list.append(data)
+
+async def generate_chart_data(
+    engine,
+    semaphore: TenantQuerySlots,
+    chart_config,
+    deadline: float | None = None,
+    shared_queries: dict | None = None,
+):
+    plan = chart_plans.get(chart_config)
+    result = await fetch_chart_rows(
+        engine, semaphore, chart_config, plan, deadline, shared_queries
+    )
+    data = plan.generator.generate_data(chart_config, result)
+    if chart_config.get("page"):
+        data["next_cursor"] = next_page_cursor(chart_config, result)
+    if chart_config.get("watermark_column"):
+        data["since_cursor"] = watermark_cursor(chart_config, result)
+        data["delta"] = bool(chart_config.get("since"))
+        # points of a delta replace the client's points with the same x value
+        data["delta_mode"] = "replace"
+    data["approximate"] = plan.sample is not None
+    if plan.sample is not None:
+        data["sample_rate"] = sample_rate(plan.sample)
+    return data
+
+
+async def iter_charts_data(
+    db_name,
+    sql_list_chart_config,
+    max_points: int | None = None,
+    dashboard_timeout: float | None = None,
+):
+    """Yield (index, chart data) pairs in the order the charts complete.
+
+    Cached charts are yielded first; pending queries are cancelled if the
+    consumer stops iterating early. Charts that exceed their own or the
+    dashboard's time budget are yielded as error records instead of failing
+    the whole dashboard.
+    """
+    if max_points:
+        sql_list_chart_config = [
+            {**chart_config, "max_points": max_points}
+            for chart_config in sql_list_chart_config
+        ]
+    data_version = await chart_cache.data_version(db_name)
+    cache_keys = [
+        chart_cache.make_key(db_name, data_version, chart_config)
+        for chart_config in sql_list_chart_config
+    ]
+    missing = []
+    for index, data in enumerate(await chart_cache.get_many(cache_keys)):
+        if data is None:
+            missing.append(index)
+        else:
+            yield index, data
+    if not missing:
+        return
+
+    async with tenant_engines.read_lease(db_name) as engine:
+        semaphore = query_scheduler.slots(
+            db_name, min(CHART_QUERY_CONCURRENCY, tenant_engines.pool_size)
+        )
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (dashboard_timeout or DASHBOARD_QUERY_TIMEOUT)
+        shared_queries = {}
+
+        async def run_chart(index):
+            chart_config = sql_list_chart_config[index]
+            try:
+                data = await asyncio.wait_for(
+                    generate_chart_data(
+                        engine, semaphore, chart_config, deadline, shared_queries
+                    ),
+                    timeout=max(deadline - loop.time(), 0),
+                )
+            except asyncio.TimeoutError:
+                return index, chart_error(
+                    chart_config, "QUERY_TIMEOUT", messages.CHART_QUERY_TIMEOUT
+                )
+            except DBAPIError as error:
+                if not is_query_canceled(error):
+                    # one broken chart query must not fail the whole dashboard
+                    return index, chart_error(
+                        chart_config, "QUERY_FAILED", messages.CHART_QUERY_FAILED
+                    )
+                return index, chart_error(
+                    chart_config, "QUERY_TIMEOUT", messages.CHART_QUERY_TIMEOUT
+                )
+            except QueryQueueFull:
+                return index, chart_error(
+                    chart_config, "QUERY_QUEUE_FULL", messages.CHART_QUERY_QUEUE_FULL
+                )
+            await chart_cache.set_many({cache_keys[index]: data})
+            return index, data
+
+        tasks = [asyncio.create_task(run_chart(index)) for index in missing]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            cancel_shared_queries(shared_queries)
+
+
+async def get_charts_data(
+    db_name,
+    sql_list_chart_config,
+    max_points: int | None = None,
+    dashboard_timeout: float | None = None,
+):
+    sql_query_list = [None] * len(sql_list_chart_config)
+    async for index, data in iter_charts_data(
+        db_name, sql_list_chart_config, max_points, dashboard_timeout
+    ):
+        sql_query_list[index] = data
     return sql_query_list
 
 
+async def precompute_charts_data(db_name, sql_list_chart_config) -> list:
+    """Run every chart of a domain outside a request, for the snapshot task.
+
+    Charts that fail are returned as None so one broken query does not keep
+    the rest of the domain from being snapshotted. It reads from the primary,
+    since a replica may not have replayed the load yet. The tenant engines are
+    disposed afterwards because the worker runs each call in a fresh loop.
+    """
+    async with tenant_engines.lease(db_name) as engine:
+        semaphore = query_scheduler.slots(
+            db_name, min(CHART_QUERY_CONCURRENCY, tenant_engines.pool_size)
+        )
+        shared_queries = {}
+        try:
+            results = await asyncio.gather(
+                *(
+                    generate_chart_data(
+                        engine, semaphore, chart_config, shared_queries=shared_queries
+                    )
+                    for chart_config in sql_list_chart_config
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            cancel_shared_queries(shared_queries)
+            await tenant_engines.dispose(db_name)
+    return [None if isinstance(data, Exception) else data for data in results]
+
+
 def get_dashboard_members(dashboard_id: int, db: Session):
     return db.query(UserDashboard).filter_by(dashboard_id=dashboard_id).all()
@@ -1,16 +1,40 @@
+import asyncio
 import json
 
-from fastapi import APIRouter, Depends, Query, status
+import orjson
+from fastapi import APIRouter, Depends, Header, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.requests import Request
 
 from app.helpers import messages
+from app.helpers.cancellation import cancel_on_disconnect
+from app.helpers.chart_cache import chart_cache, chart_etag
+from app.helpers.chart_encoding import (
+    MSGPACK_MEDIA_TYPE,
+    chart_media_type,
+    columnar_chart_data,
+)
+from app.helpers.data_events import (
+    SSE_HEARTBEAT_INTERVAL,
+    data_change_broadcaster,
+    server_sent_event,
+)
 from app.helpers.database import get_db
 from app.helpers.exceptions import NotFound, ValidationError
 from app.helpers.middlewares import is_member_middleware, is_owner_middleware
-from app.helpers.response import Response
+from app.helpers.pagination import chart_keyset_tiebreaker, decode_cursor
+from app.helpers.response import (
+    MsgPackResponse,
+    Response,
+    etag_matches,
+    json_default,
+    not_modified_response,
+)
 
 from ...helpers.mail import send_mail
 from ...settings import FRONT_API
+from ..admin.schemas.credentials import ChartGranularity
 from ..auth.crud import create_user, get_user_by_email
 from ..auth.utils import generate_auth_code
 from ..organization.crud import (
@@ -21,20 +45,27 @@ from ..organization.crud import (
 from ..organization.models import VerificationStatusTypes
 from .chart_data_creator import CHART_TYPES_SQL, ChartFactory
 from .crud import (
+    chart_config_data,
     check_user_in_dashboard,
     dashboard_delete,
     del_dashboard_user,
+    get_chart_by_id,
     get_charts_config,
+    get_charts_config_data,
     get_charts_data,
+    get_dashboard_by_id,
     get_dashboard_members,
     get_dashboards,
     get_domain_by_dashboard_id,
+    get_fresh_chart_snapshots,
     get_ordered_pinned_dashboard,
     get_shared_dashboards_by_user,
     insert_user_dashboard,
+    iter_charts_data,
     update_dashboard_last_viewed,
     update_dashboard_name,
     update_dashboard_pin,
+    with_granularity,
 )
 from .schema import (
     DashboardListSchema,
@@ -62,10 +93,8 @@ async def dashboard(
     user: UserInfoSchema = Depends(is_member_middleware()),
 ):
     dashboard_items = get_dashboards(db, search, sort_by, user)
-    dashboards = DashboardListSchema(dashboards=dashboard_items).model_dump()
-    return Response(
-        data=dashboards["dashboards"], message=messages.SUCCESS, code=status.HTTP_200_OK
-    )
+    dashboards = DashboardListSchema(dashboards=dashboard_items).dashboards
+    return Response(data=dashboards, message=messages.SUCCESS, code=status.HTTP_200_OK)
 
 
 @router.patch("/pin")
@@ -115,10 +144,8 @@ async def pinned_dashboards(
     user: UserInfoSchema = Depends(is_owner_middleware()),
 ):
     dashboard_items = get_ordered_pinned_dashboard(user, db)
-    dashboards = DashboardListSchema(dashboards=dashboard_items).model_dump()
-    return Response(
-        data=dashboards["dashboards"], message=messages.SUCCESS, code=status.HTTP_200_OK
-    )
+    dashboards = DashboardListSchema(dashboards=dashboard_items).dashboards
+    return Response(data=dashboards, message=messages.SUCCESS, code=status.HTTP_200_OK)
 
 
 @router.get("/get-shared-dashboards/{user_id}")
@@ -128,10 +155,8 @@ async def get_shared_dashboards(
     db: Session = Depends(get_db),
 ):
     shared_dashboards = get_shared_dashboards_by_user(user_id, user, db)
-    dashboards = DashboardListSchema(dashboards=shared_dashboards).model_dump()
-    return Response(
-        data=dashboards["dashboards"], message=messages.SUCCESS, code=status.HTTP_200_OK
-    )
+    dashboards = DashboardListSchema(dashboards=shared_dashboards).dashboards
+    return Response(data=dashboards, message=messages.SUCCESS, code=status.HTTP_200_OK)
 
 
 @router.post("/share-dashboard")
@@ -220,6 +245,7 @@ async def chart_data(
             "type": chart_config["type"],
             "metrics": chart_config["metrics"],
             "source_table": chart_config["source_table"],
+            "sample": chart_config.get("sample"),
         }
         for chart_config in chart_config_data
     ]
@@ -232,27 +258,241 @@ async def chart_data(
     )
 
 
+def get_dashboard_timeout(dashboard_id: int, db: Session) -> float | None:
+    dashboard = get_dashboard_by_id(dashboard_id, db)
+    return dashboard.query_timeout if dashboard else None
+
+
+def chart_error_headers(chart_data_list: list[dict], headers: dict) -> dict:
+    """Headers for chart data; payloads with error records are not cacheable.
+
+    A timeout or a full queue is transient, so clients must not keep (and
+    revalidate with an ETag) a response that contains one.
+    """
+    if any(chart_data.get("error") for chart_data in chart_data_list):
+        return {"Cache-Control": "no-store", "Vary": "Accept"}
+    return headers
+
+
+def chart_response(media_type: str, data, headers: dict):
+    if media_type == MSGPACK_MEDIA_TYPE:
+        if isinstance(data, list):
+            data = [columnar_chart_data(chart_data) for chart_data in data]
+        else:
+            data = columnar_chart_data(data)
+        response_class = MsgPackResponse
+    else:
+        response_class = Response
+    return response_class(
+        data=data,
+        message=messages.SUCCESS,
+        code=status.HTTP_200_OK,
+        headers=headers,
+    )
+
+
 @router.get("/{dashboard_id}/charts")
 async def charts(
+    request: Request,
     dashboard_id: int,
+    max_points: int | None = Query(default=None, ge=3),
+    granularity: ChartGranularity | None = Query(default=None),
+    if_none_match: str | None = Header(default=None),
+    accept: str | None = Header(default=None),
     db: Session = Depends(get_db),
     # user: UserInfoSchema = Depends(is_owner_middleware()),
 ):
-    chart_config_data = []
-    for chart_config in get_charts_config(dashboard_id, db):
-        config = chart_config.config
-
-        chart_config_data.append(config)
+    chart_config_data = with_granularity(
+        get_charts_config_data(dashboard_id, db), granularity
+    )
 
     db_name = get_domain_by_dashboard_id(dashboard_id, db)
 
-    chart_data_list = await get_charts_data(db_name, chart_config_data)
+    data_version = await chart_cache.data_version(db_name)
+    media_type = chart_media_type(accept)
+    headers = {
+        "ETag": chart_etag(
+            data_version,
+            chart_config_data,
+            max_points=max_points,
+            media_type=media_type,
+        ),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified_response(headers)
+
+    # a snapshot only matches the config hash it was taken with, so charts the
+    # granularity override changed are recomputed and the others still hit
+    snapshots = (
+        {}
+        if max_points
+        else get_fresh_chart_snapshots(chart_config_data, data_version, db)
+    )
+    missing_configs = [
+        chart_config
+        for chart_config in chart_config_data
+        if chart_config["chart_id"] not in snapshots
+    ]
+    if missing_configs:
+        missing_data = await cancel_on_disconnect(
+            request,
+            get_charts_data(
+                db_name,
+                missing_configs,
+                max_points,
+                get_dashboard_timeout(dashboard_id, db),
+            ),
+        )
+        snapshots.update(
+            zip(
+                (chart_config["chart_id"] for chart_config in missing_configs),
+                missing_data,
+            )
+        )
+    chart_data_list = [
+        snapshots[chart_config["chart_id"]] for chart_config in chart_config_data
+    ]
 
     # update_dashboard_last_viewed(user.user_id, dashboard_id, db)
-    return Response(
-        data=chart_data_list,
-        message=messages.SUCCESS,
-        code=status.HTTP_200_OK,
+    return chart_response(
+        media_type, chart_data_list, chart_error_headers(chart_data_list, headers)
+    )
+
+
+@router.get("/{dashboard_id}/charts/stream")
+async def charts_stream(
+    dashboard_id: int,
+    max_points: int | None = Query(default=None, ge=3),
+    granularity: ChartGranularity | None = Query(default=None),
+    db: Session = Depends(get_db),
+    user: UserInfoSchema = Depends(is_owner_middleware()),
+):
+    chart_config_data = with_granularity(
+        get_charts_config_data(dashboard_id, db), granularity
+    )
+    db_name = get_domain_by_dashboard_id(dashboard_id, db)
+    dashboard_timeout = get_dashboard_timeout(dashboard_id, db)
+
+    async def chart_records():
+        async for index, data in iter_charts_data(
+            db_name, chart_config_data, max_points, dashboard_timeout
+        ):
+            record = {
+                "index": index,
+                "dashboard_chart_unique_identifier": chart_config_data[index].get(
+                    "dashboard_chart_unique_identifier"
+                ),
+                "data": data,
+            }
+            yield orjson.dumps(record, default=json_default) + b"\n"
+
+    return StreamingResponse(
+        chart_records(),
+        media_type="application/x-ndjson",
+        status_code=status.HTTP_200_OK,
+    )
+
+
+@router.get("/{dashboard_id}/events")
+async def dashboard_events(
+    request: Request,
+    dashboard_id: int,
+    db: Session = Depends(get_db),
+    user: UserInfoSchema = Depends(is_owner_middleware()),
+):
+    """Server-sent events telling the client when to re-fetch the charts."""
+    db_name = get_domain_by_dashboard_id(dashboard_id, db)
+
+    async def events():
+        async with data_change_broadcaster.subscribe(db_name) as queue:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=SSE_HEARTBEAT_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield server_sent_event(
+                    "data_changed",
+                    {
+                        "dashboard_id": dashboard_id,
+                        "data_version": event["data_version"],
+                    },
+                )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{dashboard_id}/charts/{chart_id}")
+async def single_chart(
+    request: Request,
+    dashboard_id: int,
+    chart_id: int,
+    limit: int | None = Query(default=None, ge=1),
+    offset: int = Query(default=0, ge=0),
+    after: str | None = Query(default=None),
+    since: str | None = Query(default=None),
+    max_points: int | None = Query(default=None, ge=3),
+    granularity: ChartGranularity | None = Query(default=None),
+    if_none_match: str | None = Header(default=None),
+    accept: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+    user: UserInfoSchema = Depends(is_owner_middleware()),
+):
+    chart = get_chart_by_id(dashboard_id, chart_id, db)
+    if chart is None:
+        raise NotFound(messages.CHART_NOT_FOUND)
+
+    (chart_config,) = with_granularity([chart_config_data(chart)], granularity)
+    if since is not None:
+        if not chart_config.get("watermark_column"):
+            raise ValidationError(messages.WATERMARK_NOT_CONFIGURED)
+        if limit or offset or after:
+            raise ValidationError(messages.DELTA_WITH_PAGINATION)
+        decode_cursor(since)
+        chart_config = {**chart_config, "since": since}
+    elif limit or offset or after:
+        if after is not None:
+            if not chart_keyset_tiebreaker(chart_config):
+                raise ValidationError(messages.KEYSET_TIEBREAKER_REQUIRED)
+            decode_cursor(after)
+        chart_config = {
+            **chart_config,
+            "page": {"limit": limit, "offset": offset, "after": after},
+        }
+
+    db_name = get_domain_by_dashboard_id(dashboard_id, db)
+
+    data_version = await chart_cache.data_version(db_name)
+    media_type = chart_media_type(accept)
+    headers = {
+        "ETag": chart_etag(
+            data_version, [chart_config], max_points=max_points, media_type=media_type
+        ),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified_response(headers)
+
+    chart_data_list = await cancel_on_disconnect(
+        request,
+        get_charts_data(
+            db_name,
+            [chart_config],
+            max_points,
+            get_dashboard_timeout(dashboard_id, db),
+        ),
+    )
+    return chart_response(
+        media_type, chart_data_list[0], chart_error_headers(chart_data_list, headers)
     )
 
 
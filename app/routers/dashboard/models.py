@@ -1,8 +1,17 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, event
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    String,
+    event,
+)
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, relationship
 
 from app.helpers.database import BaseDBModel
 from app.routers.auth.models import User
@@ -19,6 +28,7 @@ class Dashboard(BaseDBModel):
     deleted = Column(Boolean, default=False)
     consultant_id = Column(Integer, ForeignKey("users.id"))
     dashboard_unique_identifier = Column(String, unique=True)
+    query_timeout = Column(Float)
 
 
 class UserDashboard(BaseDBModel):
@@ -46,8 +56,24 @@ class Chart(BaseDBModel):
     dashboard_chart_unique_identifier = Column(String)
 
 
+class ChartSnapshot(BaseDBModel):
+    __tablename__ = "chart_snapshot"
+
+    id = Column(Integer, primary_key=True)
+    chart_id = Column(
+        Integer, ForeignKey("chart.id", ondelete="CASCADE"), unique=True, nullable=False
+    )
+    chart = relationship(
+        "Chart", backref=backref("snapshot", uselist=False, passive_deletes=True)
+    )
+    data_version = Column(Integer, nullable=False)
+    config_hash = Column(String, nullable=False)
+    data = Column(JSONB)
+
+
 @event.listens_for(Dashboard, "before_update")
 @event.listens_for(UserDashboard, "before_update")
 @event.listens_for(Chart, "before_update")
+@event.listens_for(ChartSnapshot, "before_update")
 def receive_before_update(mapper, connection, target):
     target.updated_at = datetime.utcnow()
@@ -1,5 +1,4 @@
 from fastapi import APIRouter, Depends, Query, Request, status
-from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app.helpers import messages
@@ -60,7 +59,9 @@ async def organization_users_list(
     user_info: str = Depends(is_owner_middleware()),
 ):
     users = get_organization_users(organization_id, search, db)
-    data = OrganizationUsersSchema(users=jsonable_encoder(users)).model_dump()
+    data = OrganizationUsersSchema.model_validate(
+        {"users": users}, from_attributes=True
+    )
     return Response(data=data, message=messages.SUCCESS, code=status.HTTP_200_OK)
 
 
@@ -191,11 +192,11 @@ async def user_organizations_list(
     db: Session = Depends(get_db),
 ):
     data = user_organizations(user.id, db)
-    organizations = OrganizationSchema(
-        organizations=jsonable_encoder(data)
-    ).model_dump()
+    organizations = OrganizationSchema.model_validate(
+        {"organizations": data}, from_attributes=True
+    )
     return Response(
-        data=organizations["organizations"],
+        data=organizations.organizations,
         message=messages.SUCCESS,
         code=status.HTTP_200_OK,
     )
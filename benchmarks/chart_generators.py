@@ -0,0 +1,78 @@
+"""Micro-benchmark for the chart data generators.
+
+Rows are real SQLAlchemy ``Row`` objects fetched from an in-memory SQLite
+database, so the numbers include the cost of reading values from result rows.
+
+    python -m benchmarks.chart_generators --rows 100000
+"""
+import argparse
+import timeit
+
+from sqlalchemy import create_engine, text
+
+from app.helpers.chart_data_factory import ChartGeneratorFactory
+from app.routers.admin.schemas.credentials import ChartType
+
+SERIES_SQL = """
+WITH RECURSIVE series(x) AS (
+    SELECT 0 UNION ALL SELECT x + 1 FROM series WHERE x < :rows - 1
+)
+SELECT x, x * 0.5 AS y, 'label_' || x AS label FROM series
+"""
+
+LINES = [{"name": f"line_{index}"} for index in range(3)]
+
+MULTI_SERIES_CHART_TYPES = [
+    ChartType.multi_line,
+    ChartType.area,
+    ChartType.composed,
+    ChartType.radar,
+    ChartType.radar_bar,
+]
+
+
+def fetch_rows(rows: int):
+    engine = create_engine("sqlite://")
+    with engine.connect() as connection:
+        return connection.execute(text(SERIES_SQL), {"rows": rows}).fetchall()
+
+
+def chart_config(chart_type: ChartType) -> dict:
+    if chart_type in (ChartType.pie_no_center, ChartType.pie_with_center):
+        return {
+            "type": chart_type.value,
+            "label_field": "label",
+            "metrics": {"column": "y"},
+        }
+    config = {"type": chart_type.value, "metrics": {"x-axis": "x", "y-axis": "y"}}
+    if chart_type in MULTI_SERIES_CHART_TYPES:
+        config["lines"] = LINES
+    return config
+
+
+def run(rows: int, repeat: int):
+    data = fetch_rows(rows)
+    print(f"{'chart type':<16}{'rows/sec':>16}")
+    for chart_type in ChartGeneratorFactory.CHART_GENERATOR:
+        generator = ChartGeneratorFactory.get_chart_data(chart_type)
+        config = chart_config(chart_type)
+        if chart_type in MULTI_SERIES_CHART_TYPES:
+            chart_data, total_rows = [data] * len(LINES), rows * len(LINES)
+        else:
+            chart_data, total_rows = data, rows
+        best = min(
+            timeit.repeat(
+                lambda: generator.generate_data(config, chart_data),
+                number=1,
+                repeat=repeat,
+            )
+        )
+        print(f"{chart_type.value:<16}{total_rows / best:>16,.0f}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-r", "--rows", type=int, default=100_000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    run(args.rows, args.repeat)
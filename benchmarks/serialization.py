@@ -0,0 +1,97 @@
+"""Benchmark for serializing dashboard and chart payloads.
+
+Compares the previous path (``model_dump`` + ``jsonable_encoder`` + stdlib
+``json`` through ``JSONResponse``) with the orjson based ``Response``.
+
+    python -m benchmarks.serialization --charts 20 --points 5000
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.helpers.response import Response
+from app.routers.dashboard.schema import DashboardListSchema
+
+
+def chart_payloads(charts: int, points: int) -> list[dict]:
+    start = datetime(2023, 1, 1)
+    return [
+        {
+            "size": 1,
+            "type": "multi_line",
+            "data": [
+                {
+                    "name": start + timedelta(hours=point),
+                    "line_1": Decimal(point) / 4,
+                    "line_2": point * 0.5,
+                }
+                for point in range(points)
+            ],
+            "metrics": {"x-axis": "x", "y-axis": "y"},
+        }
+        for _ in range(charts)
+    ]
+
+
+def dashboard_items(dashboards: int) -> list[dict]:
+    return [
+        {"id": index, "name": f"dashboard_{index}", "pinned": index % 2 == 0}
+        for index in range(dashboards)
+    ]
+
+
+def previous_charts(payload):
+    return JSONResponse(content=jsonable_encoder({"data": payload})).body
+
+
+def current_charts(payload):
+    return Response(data=payload).body
+
+
+def previous_dashboards(items):
+    dashboards = DashboardListSchema(dashboards=items).model_dump()
+    return JSONResponse(
+        content=jsonable_encoder({"data": dashboards["dashboards"]})
+    ).body
+
+
+def current_dashboards(items):
+    return Response(data=DashboardListSchema(dashboards=items).dashboards).body
+
+
+def best_of(function, argument, repeat: int) -> float:
+    return min(timeit.repeat(lambda: function(argument), number=1, repeat=repeat))
+
+
+def run(charts: int, points: int, dashboards: int, repeat: int):
+    cases = [
+        ("charts", chart_payloads(charts, points), previous_charts, current_charts),
+        (
+            "dashboards",
+            dashboard_items(dashboards),
+            previous_dashboards,
+            current_dashboards,
+        ),
+    ]
+    print(f"{'payload':<12}{'previous ms':>14}{'current ms':>14}{'speedup':>10}")
+    for name, payload, previous, current in cases:
+        previous_time = best_of(previous, payload, repeat)
+        current_time = best_of(current, payload, repeat)
+        print(
+            f"{name:<12}{previous_time * 1000:>14.1f}{current_time * 1000:>14.1f}"
+            f"{previous_time / current_time:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--charts", type=int, default=20)
+    arg_parser.add_argument("--points", type=int, default=5_000)
+    arg_parser.add_argument("--dashboards", type=int, default=1_000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    run(args.charts, args.points, args.dashboards, args.repeat)